@@ -0,0 +1,132 @@
+"""Compare the CPU time and bytes on the wire of each compression level for
+the responses of real endpoints.
+
+Runs against the MONGO_URI_TESTING database, like the test suite, after
+seeding it with blogs that are removed again afterwards:
+
+    python benchmarks/compression.py [number of blogs] [runs per level]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+from dotenv import dotenv_values
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../")))
+
+from blogger101 import create_app, app_extensions, compression, markdown_render
+
+if "DYNO" not in os.environ and "GITHUB_ACTIONS" not in os.environ:
+    MONGO_URI_TESTING = dotenv_values()["MONGO_URI_TESTING"]
+else:
+    MONGO_URI_TESTING = os.environ["MONGO_URI_TESTING"]
+
+ENDPOINTS = [
+    "/",
+    "/blog/benchmark_0/",
+    "/api/v1/blogs",
+    "/api/v1/blogs?limit=20",
+    "/api/v1/blog-comments/Benchmark 0",
+]
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 5, 6, 11), "zstd": (1, 3, 6, 9)}
+
+POST = """## Section {number}
+
+Some *Markdown* with `code`, a [link](https://example.com) and a list:
+
+- one
+- two
+
+```python
+print({number})
+```
+"""
+
+
+def seed(blogs):
+    now = datetime.datetime.utcnow()
+    comment_ids = [
+        str(_id)
+        for _id in app_extensions.mongo.db.comments.insert_many(
+            {
+                "comment": f"&zwnj;Comment {number}",
+                "user": "BenchMark",
+                "html": markdown_render.render(f"Comment {number}"),
+                "benchmark": True,
+            }
+            for number in range(20)
+        ).inserted_ids
+    ]
+    documents = []
+    for number in range(blogs):
+        text = "\n".join(POST.format(number=section) for section in range(10))
+        released_at = now - datetime.timedelta(minutes=number)
+        documents.append(
+            {
+                "title": f"Benchmark {number}",
+                "user": "BenchMark",
+                "name": f"benchmark_{number}.html",
+                "text": text,
+                **markdown_render.rendered_fields(text),
+                "link": f"/blog/benchmark_{number}",
+                "date_released": released_at.strftime("%m/%d/%Y"),
+                "time_released": released_at.strftime("%H:%M:%S:%f"),
+                "released_at": released_at,
+                "updated_at": released_at,
+                "comments": [[_id, []] for _id in comment_ids],
+                "image": "",
+                "benchmark": True,
+            }
+        )
+    app_extensions.mongo.db.blogs.insert_many(documents)
+
+
+def main(blogs=200, runs=20):
+    app = create_app({"MAIL_DISPATCHER_THREAD": False})
+    app.config.update(
+        {
+            "TESTING": True,
+            "MONGO_URI": MONGO_URI_TESTING,
+            "MAIL_TRANSPORT": "stub",
+            "RECAPTCHA_VERIFIER": "fake",
+            "PAGE_CACHE_SIZE": 0,
+        }
+    )
+    app_extensions.mongo.init_app(app)
+
+    with app.app_context():
+        seed(blogs)
+        try:
+            client = app.test_client()
+            bodies = {
+                endpoint: client.get(
+                    endpoint, headers={"Accept-Encoding": "identity"}
+                ).data
+                for endpoint in ENDPOINTS
+            }
+        finally:
+            app_extensions.mongo.db.blogs.delete_many({"benchmark": True})
+            app_extensions.mongo.db.comments.delete_many({"benchmark": True})
+
+    print(f"{'endpoint':36} {'encoding':9} {'bytes':>9} {'ratio':>6} {'CPU ms':>7}")
+    for endpoint, body in bodies.items():
+        print(f"{endpoint:36} {'identity':9} {len(body):9} {1:6.2f} {0:7.2f}")
+        for algorithm, levels in LEVELS.items():
+            if algorithm == "zstd" and compression.zstandard is None:
+                continue
+            for level in levels:
+                started = time.process_time()
+                for _ in range(runs):
+                    compressed = compression.compress(body, algorithm, level)
+                elapsed = (time.process_time() - started) / runs
+                print(
+                    f"{'':36} {f'{algorithm}-{level}':9} {len(compressed):9}"
+                    f" {len(body) / len(compressed):6.2f} {elapsed * 1000:7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,74 @@
+"""Measure the CPU time and bcrypt verifications spent per web login.
+
+Runs against the MONGO_URI_TESTING database, like the test suite:
+
+    python benchmarks/login_cpu.py [number of logins]
+"""
+
+import os
+import sys
+import time
+
+from dotenv import dotenv_values
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../")))
+
+from blogger101 import create_app, app_extensions, passwords
+
+if "DYNO" not in os.environ and "GITHUB_ACTIONS" not in os.environ:
+    MONGO_URI_TESTING = dotenv_values()["MONGO_URI_TESTING"]
+else:
+    MONGO_URI_TESTING = os.environ["MONGO_URI_TESTING"]
+
+
+def main(logins=20):
+    app = create_app({"MAIL_DISPATCHER_THREAD": False})
+    app.config.update(
+        {
+            "TESTING": True,
+            "MONGO_URI": MONGO_URI_TESTING,
+            "MAIL_TRANSPORT": "stub",
+            "RECAPTCHA_VERIFIER": "fake",
+        }
+    )
+    app_extensions.mongo.init_app(app)
+
+    with app.app_context():
+        app_extensions.mongo.db.users.insert_one(
+            {
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "username": "BenchMark",
+                "email": "bench@mark.com",
+                "password": passwords.hasher.hash("Password123"),
+            }
+        )
+
+        checks = 0
+        check = passwords.hasher.check
+
+        def counting_check(password_hash, password):
+            nonlocal checks
+            checks += 1
+            return check(password_hash, password)
+
+        passwords.hasher.check = counting_check
+        try:
+            started = time.process_time()
+            for _ in range(logins):
+                app.test_client().post(
+                    "/login",
+                    data={"email": "bench@mark.com", "password": "Password123"},
+                )
+            elapsed = time.process_time() - started
+        finally:
+            passwords.hasher.check = check
+            app_extensions.mongo.db.users.delete_one({"email": "bench@mark.com"})
+
+    print(f"bcrypt cost:          {app.config['BCRYPT_LOG_ROUNDS']}")
+    print(f"bcrypt checks/login:  {checks / logins:.1f}")
+    print(f"CPU ms/login:         {elapsed / logins * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""Measure the latency of /api/v1/search on a synthetic corpus against the
+budget set by LATENCY_BUDGET_MS.
+
+Runs against the MONGO_URI_TESTING database, like the test suite, after
+seeding it with blogs that are removed again afterwards:
+
+    python benchmarks/search.py [number of blogs] [queries per case]
+"""
+
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+from dotenv import dotenv_values
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../")))
+
+from blogger101 import create_app, app_extensions, db, markdown_render
+
+if "DYNO" not in os.environ and "GITHUB_ACTIONS" not in os.environ:
+    MONGO_URI_TESTING = dotenv_values()["MONGO_URI_TESTING"]
+else:
+    MONGO_URI_TESTING = os.environ["MONGO_URI_TESTING"]
+
+# The 95th percentile of a search should stay below this
+LATENCY_BUDGET_MS = 150
+
+BATCH_SIZE = 1000
+
+# Common words land in many blogs, rare ones in few, like in a real corpus
+COMMON_WORDS = "garden travel recipe python music school family weekend".split()
+RARE_WORDS = [f"topic{number}" for number in range(2000)]
+
+CASES = {
+    "common word": "/api/v1/search?q={common}",
+    "rare word": "/api/v1/search?q={rare}",
+    "two words": "/api/v1/search?q={common}+{rare}",
+    "common word, recent": "/api/v1/search?q={common}&recent=1",
+    "rare word, recent": "/api/v1/search?q={rare}&recent=1",
+}
+
+
+def blog(number: int, now: datetime.datetime) -> dict:
+    words = random.choices(COMMON_WORDS, k=3) + random.choices(RARE_WORDS, k=3)
+    text = " ".join(
+        random.choice(words) if index % 4 == 0 else "lorem ipsum dolor"
+        for index in range(100)
+    )
+    released_at = now - datetime.timedelta(minutes=number)
+    return {
+        "title": f"Benchmark {number} {words[0]} {words[3]}",
+        "user": "BenchMark",
+        "name": f"benchmark_{number}.html",
+        "text": text,
+        **markdown_render.rendered_fields(text),
+        "link": f"/blog/benchmark_{number}",
+        "released_at": released_at,
+        "updated_at": released_at,
+        "comments": [],
+        "image": "",
+        "benchmark": True,
+    }
+
+
+def seed(blogs: int):
+    now = datetime.datetime.utcnow()
+    for start in range(0, blogs, BATCH_SIZE):
+        app_extensions.mongo.db.blogs.insert_many(
+            blog(number, now) for number in range(start, min(start + BATCH_SIZE, blogs))
+        )
+
+
+def main(blogs=100_000, queries=50):
+    random.seed(0)
+    app = create_app({"MAIL_DISPATCHER_THREAD": False})
+    app.config.update(
+        {
+            "TESTING": True,
+            "MONGO_URI": MONGO_URI_TESTING,
+            "MAIL_TRANSPORT": "stub",
+            "RECAPTCHA_VERIFIER": "fake",
+        }
+    )
+    app_extensions.mongo.init_app(app)
+
+    with app.app_context():
+        seed(blogs)
+        try:
+            db.ensure_indexes()
+            client = app.test_client()
+            print(f"{'case':22} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+            over_budget = False
+            for case, url in CASES.items():
+                timings = []
+                for _ in range(queries):
+                    started = time.perf_counter()
+                    response = client.get(
+                        url.format(
+                            common=random.choice(COMMON_WORDS),
+                            rare=random.choice(RARE_WORDS),
+                        )
+                    )
+                    timings.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200, response.get_json()
+                p95 = statistics.quantiles(timings, n=20)[-1]
+                over = p95 > LATENCY_BUDGET_MS
+                over_budget |= over
+                print(
+                    f"{case:22} {statistics.median(timings):7.1f} {p95:7.1f}"
+                    f" {max(timings):7.1f}{'  over budget' if over else ''}"
+                )
+        finally:
+            app_extensions.mongo.db.blogs.delete_many({"benchmark": True})
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -3,19 +3,48 @@ import os
 
 from flask import Flask
 from dotenv import dotenv_values
-import pyimgur
 
 from blogger101 import app_extensions
 from blogger101.app_extensions import (
     mongo,
-    flask_bcrypt,
-    flask_compress,
     flask_cors,
 )
+from blogger101 import cache
+from blogger101 import compression
 from blogger101 import email_oauth
+from blogger101 import image_uploads
+from blogger101 import mail_queue
+from blogger101 import passwords
+from blogger101 import recaptcha
+from blogger101 import static_assets
+from blogger101 import view_counts
+from blogger101 import db
 from blogger101.routes import bp
 
 
+# Tuning settings that fall back to a default when they are not set
+OPTIONAL_SETTINGS = (
+    "BLOG_CACHE_BACKEND",
+    "MAX_CONTENT_LENGTH",
+    "BCRYPT_LOG_ROUNDS",
+    "BCRYPT_TARGET_SECONDS",
+    "BCRYPT_PROCESS_POOL_SIZE",
+    "ENSURE_INDEXES_ON_STARTUP",
+    "SURROGATE_MAX_AGE",
+    "PAGE_CACHE_SIZE",
+    "PAGE_CACHE_TTL",
+    "ASSETS_FOLDER",
+    "ASSETS_BUILD_ON_STARTUP",
+    "IMAGE_UPLOAD_WORKERS",
+    "IMAGE_UPLOAD_ATTEMPTS",
+    "IMAGE_UPLOAD_BACKOFF",
+    "VIEW_FLUSH_INTERVAL",
+    "VIEW_FLUSH_THRESHOLD",
+    "TRENDING_INTERVAL",
+    "CHANGES_SETTLE_SECONDS",
+    "SEARCH_MAX_TIME_MS",
+)
+
 if "DYNO" in os.environ or "GITHUB_ACTIONS" in os.environ:
     config = {
         "IMGUR_ID": os.environ["IMGUR_ID"],
@@ -26,6 +55,9 @@ if "DYNO" in os.environ or "GITHUB_ACTIONS" in os.environ:
         "EMAIL_SENDER": os.environ["EMAIL_ADDRESS"],
         "EMAIL_TOKEN": os.environ["EMAIL_TOKEN"],
     }
+    config.update(
+        {key: os.environ[key] for key in OPTIONAL_SETTINGS if key in os.environ}
+    )
 else:
     config = dotenv_values()
 config["EMAIL_TOKEN"] = json.loads(config["EMAIL_TOKEN"])
@@ -33,6 +65,8 @@ config["TESTING"] = False
 
 app_extensions.RECAPTCHA_SITEKEY = config["RECAPTCHA_SITEKEY"]
 
+DEFAULT_MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+
 
 def create_app(test_config=None):
     global app
@@ -42,20 +76,38 @@ def create_app(test_config=None):
     config.update({} if test_config is None else test_config)
 
     app.config.from_mapping(**config)
+    app.config["MAX_CONTENT_LENGTH"] = int(
+        app.config["MAX_CONTENT_LENGTH"] or DEFAULT_MAX_CONTENT_LENGTH
+    )
 
     mongo.init_app(app)
-    flask_bcrypt.init_app(app)
-    flask_compress.init_app(app)
+    passwords.hasher.init_app(app)
+    compression.compressor.init_app(app)
     flask_cors.init_app(app)
+    cache.blog_listing.init_app(app)
+    cache.pages.init_app(app)
+    static_assets.assets.init_app(app)
 
-    app.config["ImgurObject"] = pyimgur.Imgur(app.config["IMGUR_ID"])
+    image_uploads.uploader.init_app(app)
 
     app_extensions.Serialize_Secret_Keys[0] = app.config["SECRET_KEY"]
 
-    app.config["GMAIL_API_Creds"] = email_oauth.load_credentials_from_dict(
+    app.config["GMAIL_Credentials"] = email_oauth.CredentialHolder.from_dict(
         app.config["EMAIL_TOKEN"]
     )
+    app.config["GMAIL_API_Creds"] = app.config["GMAIL_Credentials"].build_service()
+    mail_queue.dispatcher.init_app(app)
+    recaptcha.scorer.init_app(app)
+    view_counts.counter.init_app(app)
 
     app.register_blueprint(bp)
+    app.cli.add_command(db.db_cli)
+    app.cli.add_command(static_assets.assets_cli)
+
+    if str(app.config.get("ENSURE_INDEXES_ON_STARTUP", "")).lower() in ("1", "true"):
+        try:
+            db.ensure_indexes()
+        except Exception:
+            app.logger.exception("Creating the MongoDB indexes failed")
 
     return app
@@ -1,12 +1,8 @@
 from flask_pymongo import PyMongo
-from flask_compress import Compress
 from flask_cors import CORS
-from flask_bcrypt import Bcrypt
 from itsdangerous import URLSafeTimedSerializer
 
 mongo = PyMongo()
-flask_bcrypt = Bcrypt()
-flask_compress = Compress()
 flask_cors = CORS(resources={"/api/*": {"origins": "*"}})
 
 RECAPTCHA_SITEKEY = None
@@ -1,14 +1,53 @@
-from blogger101.app_extensions import mongo, flask_bcrypt
+from flask import current_app
+
+from blogger101.app_extensions import mongo
+from blogger101.passwords import hasher
+from blogger101 import recaptcha
+
+
+RECAPTCHA_MIN_SCORE = 0.5
+
+SESSION_FIELDS = ("first_name", "last_name", "email", "username")
 
 
 def logged_in(session):
     return "logged_in" in session and session["logged_in"] not in (None, {})
 
 
+def log_in(session, user: dict):
+    session["logged_in"] = {field: user[field] for field in SESSION_FIELDS}
+
+
 def check_login(email: str, password: str) -> dict:
     user = mongo.db.users.find_one({"email": email})
     if user is None:
         return {"error": True, "message": "A User With That Email Was Not Found"}
-    if flask_bcrypt.check_password_hash(user["password"], password):
+    if hasher.check(user["password"], password):
+        hasher.rehash_if_needed(user, password)
         return {"error": False, "message": "Success", "user": user}
     return {"error": True, "message": "Incorrect Password"}
+
+
+def verify_login(email: str, password: str, recaptcha_token) -> dict:
+    """Check a web login attempt.
+
+    The password is verified exactly once. reCAPTCHA is only consulted once
+    the password matches, so failed guesses never reach Google. On success
+    the result holds the ``user`` and whether reCAPTCHA judged the attempt
+    ``human``. Logins that are not, or whose verification failed, get their
+    session only after confirming by email.
+    """
+    user = mongo.db.users.find_one({"email": email})
+    if user is None:
+        return {"error": True, "message": "A User With That Email Was Not Found"}
+    if not hasher.check(user["password"], password):
+        return {"error": True, "message": "Incorrect Password"}
+
+    score = recaptcha.scorer.submit(recaptcha_token)
+    hasher.rehash_if_needed(user, password)
+    try:
+        human = score.result() >= RECAPTCHA_MIN_SCORE
+    except Exception:
+        current_app.logger.exception("reCAPTCHA verification failed")
+        human = False
+    return {"error": False, "message": "Success", "user": user, "human": human}
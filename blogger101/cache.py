@@ -0,0 +1,171 @@
+import collections
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+from blogger101.app_extensions import mongo
+
+
+class LocalVersion:
+    """A version counter that only the current process can see."""
+
+    def __init__(self):
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> int:
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+
+class MongoVersion:
+    """A version counter stored in the ``cache_versions`` collection.
+
+    Every gunicorn worker reads the same document, so a write handled by one
+    worker invalidates the caches of all of them. The counter is re-read at
+    most once per ``check_interval`` seconds.
+    """
+
+    def __init__(self, name: str, check_interval: float = 1.0):
+        self.name = name
+        self.check_interval = check_interval
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self) -> int:
+        if (
+            self._version is None
+            or time.monotonic() - self._checked_at >= self.check_interval
+        ):
+            doc = mongo.db.cache_versions.find_one({"_id": self.name})
+            self._version = 0 if doc is None else doc["version"]
+            self._checked_at = time.monotonic()
+        return self._version
+
+    def bump(self):
+        doc = mongo.db.cache_versions.find_one_and_update(
+            {"_id": self.name},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._version = doc["version"]
+        self._checked_at = time.monotonic()
+
+
+class VersionedCache:
+    """Keeps computed values until the version they were computed at changes.
+
+    Writers call :meth:`bump` instead of deleting keys, so every cached
+    value is invalidated at once without having to know which keys exist.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.version = LocalVersion()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get("BLOG_CACHE_BACKEND", "local")
+        if backend == "local":
+            self.version = LocalVersion()
+        elif backend == "mongo":
+            self.version = MongoVersion(
+                self.name, app.config.get("BLOG_CACHE_CHECK_INTERVAL", 1.0)
+            )
+        else:
+            raise ValueError(f"Unknown BLOG_CACHE_BACKEND {backend!r}")
+        self.clear()
+
+    def get_or_set(self, key, loader):
+        version = self.version.get()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def bump(self):
+        self.version.bump()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RenderedPageCache:
+    """Pages rendered for anonymous visitors, who all get the same HTML.
+
+    Entries follow the version of ``versioned``, so the blog writes that
+    invalidate it invalidate the pages too. They also expire after
+    ``PAGE_CACHE_TTL`` seconds, and the least recently used are evicted once
+    there are more than ``PAGE_CACHE_SIZE`` of them.
+    """
+
+    def __init__(self, versioned: VersionedCache):
+        self.versioned = versioned
+        self.app = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("PAGE_CACHE_SIZE", 256)
+        app.config.setdefault("PAGE_CACHE_TTL", 60)
+        self.clear()
+
+    def get_or_set(self, key, loader):
+        """Return the cached value of ``key`` or store what ``loader`` returns.
+
+        A loader returning None is not cached, for pages that should not be.
+        """
+        version = self.versioned.version.get()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        value = loader()
+        max_entries = int(self.app.config["PAGE_CACHE_SIZE"])
+        if value is None or max_entries <= 0:
+            return value
+        expires_at = now + float(self.app.config["PAGE_CACHE_TTL"])
+        with self._lock:
+            self._entries[key] = (version, expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+blog_listing = VersionedCache("blog_listing")
+pages = RenderedPageCache(blog_listing)
@@ -0,0 +1,93 @@
+import datetime
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING
+
+from blogger101.app_extensions import mongo
+from blogger101 import listing
+
+# Clients that last synced before this have to download everything again,
+# since the tombstones of older deletions are gone
+TOMBSTONE_LIFETIME = datetime.timedelta(days=30)
+
+# Writes are stamped before they commit, so one stamped earlier can become
+# visible after a later one. The feed stops this far behind the clock so
+# that no such write lands behind a token that was already handed out.
+DEFAULT_SETTLE_SECONDS = 5
+
+CHANGED_FIRST = [("updated_at", ASCENDING), ("_id", ASCENDING)]
+DELETED_FIRST = [("deleted_at", ASCENDING), ("_id", ASCENDING)]
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def record_deletion(blog_id):
+    mongo.db.blog_tombstones.replace_one(
+        {"_id": blog_id},
+        {"_id": blog_id, "deleted_at": datetime.datetime.utcnow()},
+        upsert=True,
+    )
+
+
+def _after(field: str, since):
+    if since is None:
+        return {}
+    when, _id = since
+    return {
+        "$or": [
+            {field: {"$gt": when}},
+            {field: when, "_id": {"$gt": _id}},
+        ]
+    }
+
+
+def _window(field: str, since, until) -> dict:
+    return {"$and": [_after(field, since), {field: {"$lte": until}}]}
+
+
+def find_changes(token, limit: int, settle_seconds=DEFAULT_SETTLE_SECONDS):
+    """Return the blogs written and the ids of those deleted after ``token``,
+    oldest first, with the token to continue from and whether more remain.
+
+    Without a token the feed starts at the beginning, which is a full sync.
+    Raises ExpiredToken when the token is older than the tombstones kept.
+    """
+    now = datetime.datetime.utcnow()
+    since = listing.decode_cursor(token) if token else None
+    if since is not None and since[0] < now - TOMBSTONE_LIFETIME:
+        raise ExpiredToken(token)
+    until = now - datetime.timedelta(seconds=settle_seconds)
+
+    written = [
+        (blog["updated_at"], blog["_id"], blog)
+        for blog in mongo.db.blogs.find(
+            _window("updated_at", since, until), listing.EXPORT_FIELDS
+        )
+        .sort(CHANGED_FIRST)
+        .limit(limit + 1)
+    ]
+    deleted = [
+        (tombstone["deleted_at"], tombstone["_id"], None)
+        for tombstone in mongo.db.blog_tombstones.find(
+            _window("deleted_at", since, until)
+        )
+        .sort(DELETED_FIRST)
+        .limit(limit + 1)
+    ]
+    changes = sorted(written + deleted, key=lambda change: change[:2])
+    more = len(changes) > limit
+    changes = changes[:limit]
+
+    if changes:
+        next_token = listing.encode_position(*changes[-1][:2])
+    else:
+        # Nothing was written up to ``until``, so the next sync can start there
+        next_token = listing.encode_position(until, ObjectId("0" * 24))
+    return (
+        [blog for _, _, blog in changes if blog is not None],
+        [_id for _, _id, blog in changes if blog is None],
+        next_token,
+        more,
+    )
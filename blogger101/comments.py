@@ -0,0 +1,63 @@
+from bson.objectid import ObjectId
+
+from blogger101 import markdown_render
+from blogger101.app_extensions import mongo
+
+
+def _html(comment: dict) -> str:
+    if "html" not in comment:
+        comment["html"] = markdown_render.render(comment["comment"])
+    return comment["html"]
+
+
+def count(threads: list) -> int:
+    """The number of comments and replies in a blog's ``comments`` array."""
+    return sum(1 + len(reply_ids) for _, reply_ids in threads)
+
+
+def load_comment_tree(threads: list, limit=None, offset=0) -> list:
+    """Build the comment tree of a blog from its ``comments`` array.
+
+    ``threads`` is the blog's list of ``[comment_id, [reply_id, ...]]`` pairs.
+    Every comment in the requested slice of threads is fetched with a single
+    ``$in`` query and the tree is assembled in memory. Comments that no longer
+    exist are left out. ``html`` is the comment rendered from Markdown, which
+    comments stored before it was added get rendered on the fly.
+    """
+    threads = threads[offset:] if limit is None else threads[offset : offset + limit]
+    ids = []
+    for comment_id, reply_ids in threads:
+        ids.append(ObjectId(str(comment_id)))
+        ids.extend(ObjectId(str(reply_id)) for reply_id in reply_ids)
+
+    found = {
+        str(comment["_id"]): comment
+        for comment in mongo.db.comments.find(
+            {"_id": {"$in": ids}}, {"comment": True, "user": True, "html": True}
+        )
+    }
+
+    comment_tree = []
+    for comment_id, reply_ids in threads:
+        comment_data = found.get(str(comment_id))
+        if comment_data is None:
+            continue
+        comment_tree.append(
+            {
+                "text": comment_data["comment"],
+                "html": _html(comment_data),
+                "user": comment_data["user"],
+                "id": str(comment_id),
+                "sub_comments": [
+                    {
+                        "text": found[str(reply_id)]["comment"],
+                        "html": _html(found[str(reply_id)]),
+                        "user": found[str(reply_id)]["user"],
+                        "id": str(reply_id),
+                    }
+                    for reply_id in reply_ids
+                    if str(reply_id) in found
+                ],
+            }
+        )
+    return comment_tree
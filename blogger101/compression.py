@@ -0,0 +1,200 @@
+import collections
+import gzip
+import zlib
+
+import brotli
+from flask import request, stream_with_context
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when the package is installed
+    zstandard = None
+
+
+class Policy(
+    collections.namedtuple("Policy", ["algorithms", "min_size", "levels", "streams"])
+):
+    """How the responses of one route are compressed.
+
+    ``algorithms`` are offered in order of preference, ``levels`` maps each
+    compressed mimetype to the level of every algorithm, responses smaller
+    than ``min_size`` bytes are sent as they are, and streamed responses are
+    only compressed when ``streams`` is set.
+    """
+
+
+# Pages are rendered per request, so they get fast levels. Larger JSON
+# payloads are worth a little more CPU for the bytes saved on mobile.
+PAGE_LEVELS = {"br": 4, "gzip": 6, "zstd": 3}
+JSON_LEVELS = {"br": 5, "gzip": 6, "zstd": 6}
+TEXT_LEVELS = {"br": 4, "gzip": 6, "zstd": 3}
+
+DEFAULT_POLICY = Policy(
+    algorithms=("br", "zstd", "gzip"),
+    # Below about one packet compression saves no round trip
+    min_size=1400,
+    levels={
+        "text/html": PAGE_LEVELS,
+        "application/json": JSON_LEVELS,
+        "application/x-ndjson": JSON_LEVELS,
+        "text/css": TEXT_LEVELS,
+        "text/javascript": TEXT_LEVELS,
+        "application/javascript": TEXT_LEVELS,
+        "text/plain": TEXT_LEVELS,
+        "image/svg+xml": TEXT_LEVELS,
+    },
+    streams=True,
+)
+
+# Overrides of DEFAULT_POLICY by endpoint
+ROUTE_POLICIES = {
+    # The full dump of every blog is the largest response the app sends. By
+    # benchmarks/compression.py gzip 9 costs no more CPU than 6 on it.
+    "routes.api_blogs": {
+        "levels": {
+            "application/json": {"br": 5, "gzip": 9, "zstd": 9},
+            "application/x-ndjson": {"br": 5, "gzip": 9, "zstd": 9},
+        }
+    },
+    # Polled by the mobile app and usually small
+    "routes.get_comments": {"min_size": 4096},
+    "routes.blog_image_status": {"algorithms": ()},
+    # Images and the precompressed assets would not shrink any further
+    "routes.uploaded_image": {"algorithms": ()},
+    "routes.asset": {"algorithms": ()},
+}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # A sync flush after every chunk sends it without waiting for the next
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+STREAM_COMPRESSORS = {"br": _Brotli, "gzip": _Gzip, "zstd": _Zstd}
+
+
+def compress(data: bytes, algorithm: str, level: int) -> bytes:
+    if algorithm == "br":
+        return brotli.compress(data, quality=level)
+    if algorithm == "gzip":
+        return gzip.compress(data, level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _compress_chunks(chunks, algorithm: str, level: int):
+    compressor = STREAM_COMPRESSORS[algorithm](level)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+class ResponseCompressor:
+    """Compresses responses according to the policy of their route.
+
+    ``COMPRESSION_POLICIES`` in the config maps endpoints to fields that
+    replace those of their policy, on top of ROUTE_POLICIES. The endpoint
+    ``"default"`` changes DEFAULT_POLICY itself, e.g.
+    ``{"default": {"algorithms": ["gzip"]}, "routes.blogs": {"min_size": 0}}``.
+    """
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("COMPRESSION_POLICIES", {})
+        app.after_request(self.after_request)
+
+    def policy(self, endpoint) -> Policy:
+        overrides = self.app.config["COMPRESSION_POLICIES"]
+        policy = DEFAULT_POLICY._replace(**overrides.get("default", {}))
+        policy = policy._replace(**ROUTE_POLICIES.get(endpoint, {}))
+        return policy._replace(**overrides.get(endpoint, {}))
+
+    def choose_algorithm(self, policy: Policy, levels: dict):
+        best, best_quality = None, 0
+        for algorithm in policy.algorithms:
+            if algorithm not in levels or (algorithm == "zstd" and zstandard is None):
+                continue
+            quality = request.accept_encodings[algorithm]
+            if quality > best_quality:
+                best, best_quality = algorithm, quality
+        return best
+
+    def after_request(self, response):
+        policy = self.policy(request.endpoint)
+        levels = policy.levels.get(response.mimetype)
+        if levels is None or not policy.algorithms:
+            return response
+        response.vary.add("Accept-Encoding")
+
+        algorithm = self.choose_algorithm(policy, levels)
+        if (
+            algorithm is None
+            or not 200 <= response.status_code < 300
+            or response.status_code == 206
+            or "Content-Encoding" in response.headers
+            or (response.is_streamed and not policy.streams)
+            or (
+                response.content_length is not None
+                and response.content_length < policy.min_size
+            )
+        ):
+            return response
+
+        response.direct_passthrough = False
+        if response.is_streamed:
+            response.response = stream_with_context(
+                _compress_chunks(response.iter_encoded(), algorithm, levels[algorithm])
+            )
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < policy.min_size:
+                return response
+            response.set_data(compress(data, algorithm, levels[algorithm]))
+
+        response.headers["Content-Encoding"] = algorithm
+        # A strong ETag names exact bytes, so each encoding gets its own
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f"{etag}:{algorithm}")
+        return response
+
+
+compressor = ResponseCompressor()
@@ -0,0 +1,400 @@
+import collections
+import datetime
+
+import click
+from flask.cli import AppGroup
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne
+
+from blogger101.app_extensions import mongo
+from blogger101 import changes
+from blogger101 import comments
+from blogger101 import listing
+from blogger101 import mail_queue
+from blogger101 import markdown_render
+from blogger101 import search
+from blogger101 import tags
+from blogger101 import view_counts
+
+db_cli = AppGroup("db", help="Database maintenance commands.")
+
+
+class IndexSpec(
+    collections.namedtuple("IndexSpec", ["collection", "keys", "options", "serves"])
+):
+    """One index the app relies on and the routes whose queries use it."""
+
+    @property
+    def name(self):
+        return self.options["name"]
+
+
+INDEXES = [
+    IndexSpec(
+        "users",
+        [("email", ASCENDING)],
+        {"name": "users_email", "unique": True},
+        [
+            "login",
+            "check_user",
+            "forgot_password",
+            "confirm_login",
+            "add_user",
+            "add_user_v2",
+            "change_password_email_api",
+            "change_password_api",
+        ],
+    ),
+    IndexSpec(
+        "users",
+        [("username", ASCENDING)],
+        {"name": "users_username", "unique": True},
+        ["user_page", "sign_up", "add_user", "add_user_v2"],
+    ),
+    IndexSpec(
+        "blogs",
+        [("name", ASCENDING)],
+        {"name": "blogs_name", "unique": True},
+        ["blog_page"],
+    ),
+    # Its title prefix also serves the queries by title alone
+    IndexSpec(
+        "blogs",
+        [("title", ASCENDING), ("user", ASCENDING)],
+        {"name": "blogs_title_user"},
+        [
+            "delete_blog",
+            "edit_blog",
+            "delete_blog_api",
+            "update_blog",
+            "add_comment",
+            "get_comments",
+        ],
+    ),
+    IndexSpec(
+        "blogs",
+        listing.NEWEST_FIRST,
+        {"name": "blogs_newest_first"},
+        ["api_blogs", "blogs"],
+    ),
+    IndexSpec(
+        "blogs",
+        [("user", ASCENDING), ("released_at", DESCENDING), ("_id", DESCENDING)],
+        {"name": "blogs_by_user_newest_first"},
+        ["myblogs", "user_blogs_api"],
+    ),
+    # Read forwards by the change feed, and backwards for the newest
+    # updated_at that is the Last-Modified of the blog listings
+    IndexSpec(
+        "blogs",
+        changes.CHANGED_FIRST,
+        {"name": "blogs_changed_first"},
+        ["blog_changes", "api_blogs"],
+    ),
+    IndexSpec(
+        "blogs",
+        [(field, TEXT) for field in search.WEIGHTS],
+        {"name": "blogs_text", "weights": search.WEIGHTS},
+        ["search_api", "search_page"],
+    ),
+    # tags is an array, so this is a multikey index with an entry per tag
+    IndexSpec(
+        "blogs",
+        [("tags", ASCENDING), ("released_at", DESCENDING), ("_id", DESCENDING)],
+        {"name": "blogs_by_tag_newest_first"},
+        ["tag_blogs"],
+    ),
+    IndexSpec(
+        "tag_counts",
+        tags.MOST_USED_FIRST,
+        {"name": "tag_counts_most_used"},
+        ["tags_api"],
+    ),
+    IndexSpec(
+        "unverified_users",
+        [("email", ASCENDING)],
+        {"name": "unverified_users_email"},
+        ["confirm_email", "confirm_email_api"],
+    ),
+    # Sign up links expire after an hour, so the unverified user can go too
+    IndexSpec(
+        "unverified_users",
+        [("created_at", ASCENDING)],
+        {"name": "unverified_users_ttl", "expireAfterSeconds": 3600},
+        ["sign_up", "add_user_v2"],
+    ),
+    # Reset links are looked up by their hashed _id and expire after an hour
+    IndexSpec(
+        "password_resets",
+        [("created_at", ASCENDING)],
+        {"name": "password_resets_ttl", "expireAfterSeconds": 3600},
+        ["forgot_password", "change_password_email_api"],
+    ),
+    IndexSpec(
+        "password_resets",
+        [("user_id", ASCENDING)],
+        {"name": "password_resets_user"},
+        ["change_password", "change_password_api"],
+    ),
+    IndexSpec(
+        "blog_tombstones",
+        [("deleted_at", ASCENDING)],
+        {
+            "name": "blog_tombstones_ttl",
+            "expireAfterSeconds": int(changes.TOMBSTONE_LIFETIME.total_seconds()),
+        },
+        ["blog_changes"],
+    ),
+    IndexSpec(
+        "blog_view_hours",
+        [("blog", ASCENDING), ("hour", ASCENDING)],
+        {"name": "blog_view_hours_blog_hour", "unique": True},
+        ["view_counts.ViewCounter"],
+    ),
+    IndexSpec(
+        "blog_view_hours",
+        [("hour", ASCENDING)],
+        {
+            "name": "blog_view_hours_ttl",
+            "expireAfterSeconds": int(view_counts.VIEW_HISTORY.total_seconds()),
+        },
+        ["view_counts.ViewCounter"],
+    ),
+    IndexSpec(
+        "trending",
+        view_counts.HIGHEST_SCORE_FIRST,
+        {"name": "trending_highest_score"},
+        ["trending_api"],
+    ),
+    IndexSpec(
+        "outbound_mail",
+        [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+        {"name": "outbound_mail_due"},
+        ["mail_queue.MailDispatcher"],
+    ),
+    IndexSpec(
+        "outbound_mail",
+        [("finished_at", ASCENDING)],
+        {
+            "name": "outbound_mail_ttl",
+            "expireAfterSeconds": int(mail_queue.MAIL_HISTORY.total_seconds()),
+        },
+        ["mail_queue.MailDispatcher"],
+    ),
+]
+
+
+def ensure_indexes(indexes=INDEXES):
+    """Create every index in ``indexes`` that does not exist yet.
+
+    Creating an index that already exists with the same keys and options
+    does nothing, so this is safe to run on every deploy.
+    """
+    for index in indexes:
+        mongo.db[index.collection].create_index(index.keys, **index.options)
+
+
+def backfill_released_at(batch_size=500) -> int:
+    """Write a native ``released_at`` datetime onto blogs that only have the
+    legacy ``date_released`` / ``time_released`` strings.
+
+    Returns the number of blogs updated.
+    """
+    updated = 0
+    pending = []
+    for blog in mongo.db.blogs.find(
+        {"released_at": {"$exists": False}},
+        {"date_released": True, "time_released": True},
+    ).batch_size(batch_size):
+        pending.append(
+            UpdateOne(
+                {"_id": blog["_id"]},
+                {
+                    "$set": {
+                        "released_at": listing.released_at_from_strings(
+                            blog["date_released"], blog["time_released"]
+                        )
+                    }
+                },
+            )
+        )
+        if len(pending) >= batch_size:
+            updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def backfill_updated_at(batch_size=500) -> int:
+    """Stamp blogs written before every write set ``updated_at`` with their
+    release time, so that the change feed includes them.
+
+    Returns the number of blogs updated.
+    """
+    updated = 0
+    pending = []
+    for blog in mongo.db.blogs.find(
+        {"updated_at": {"$exists": False}, "released_at": {"$exists": True}},
+        {"released_at": True},
+    ).batch_size(batch_size):
+        pending.append(
+            UpdateOne(
+                {"_id": blog["_id"], "updated_at": {"$exists": False}},
+                {"$set": {"updated_at": blog["released_at"]}},
+            )
+        )
+        if len(pending) >= batch_size:
+            updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def render_markdown(batch_size=500) -> int:
+    """Store rendered HTML on blogs and comments written before it was
+    rendered on save. Returns the number of documents updated."""
+    updated = 0
+    for collection, text_field, fields in (
+        (
+            mongo.db.blogs,
+            "text",
+            # The rendered fields are part of the blog, so the change feed
+            # and the listing validators must see the write
+            lambda text: {
+                **markdown_render.rendered_fields(text),
+                "updated_at": datetime.datetime.utcnow(),
+            },
+        ),
+        (
+            mongo.db.comments,
+            "comment",
+            lambda text: {"html": markdown_render.render(text)},
+        ),
+    ):
+        pending = []
+        for document in collection.find(
+            {"html": {"$exists": False}}, {text_field: True}
+        ).batch_size(batch_size):
+            pending.append(
+                UpdateOne(
+                    {"_id": document["_id"]}, {"$set": fields(document[text_field])}
+                )
+            )
+            if len(pending) >= batch_size:
+                updated += collection.bulk_write(pending, ordered=False).modified_count
+                pending = []
+        if pending:
+            updated += collection.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+def backfill_summaries(batch_size=500) -> int:
+    """Write the ``excerpt``, ``word_count`` and ``comment_count`` that list
+    views show onto blogs written before they were kept up to date.
+
+    Returns the number of blogs updated.
+    """
+    updated = 0
+    pending = []
+    for blog in mongo.db.blogs.find(
+        {
+            "$or": [
+                {"excerpt": {"$exists": False}},
+                {"comment_count": {"$exists": False}},
+            ]
+        },
+        {"text": True, "comments": True},
+    ).batch_size(batch_size):
+        pending.append(
+            UpdateOne(
+                {"_id": blog["_id"]},
+                {
+                    "$set": {
+                        **markdown_render.rendered_fields(blog["text"]),
+                        "comment_count": comments.count(blog["comments"]),
+                        "updated_at": datetime.datetime.utcnow(),
+                    }
+                },
+            )
+        )
+        if len(pending) >= batch_size:
+            updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+            pending = []
+    if pending:
+        updated += mongo.db.blogs.bulk_write(pending, ordered=False).modified_count
+    return updated
+
+
+DIRECTIONS = {ASCENDING: "asc", DESCENDING: "desc"}
+
+
+def describe(index: IndexSpec) -> str:
+    keys = ", ".join(
+        f"{field} {DIRECTIONS.get(direction, direction)}"
+        for field, direction in index.keys
+    )
+    options = [
+        f"{option}={value}"
+        for option, value in index.options.items()
+        if option != "name"
+    ]
+    return (
+        f"{index.collection}.{index.name} ({keys})"
+        + (f" [{', '.join(options)}]" if options else "")
+        + f" serves: {', '.join(index.serves)}"
+    )
+
+
+@db_cli.command("ensure-indexes")
+def ensure_indexes_command():
+    ensure_indexes()
+    for index in INDEXES:
+        click.echo(describe(index))
+    click.echo("Indexes are up to date")
+
+
+@db_cli.command("index-report")
+def index_report_command():
+    """List the declared indexes, the routes they serve, and whether they exist."""
+    for index in INDEXES:
+        exists = index.name in mongo.db[index.collection].index_information()
+        click.echo(("  " if exists else "! ") + describe(index))
+
+
+@db_cli.command("backfill-released-at")
+@click.option("--batch-size", default=500, show_default=True)
+def backfill_released_at_command(batch_size):
+    click.echo(f"Backfilled released_at on {backfill_released_at(batch_size)} blogs")
+
+
+@db_cli.command("backfill-updated-at")
+@click.option("--batch-size", default=500, show_default=True)
+def backfill_updated_at_command(batch_size):
+    click.echo(f"Backfilled updated_at on {backfill_updated_at(batch_size)} blogs")
+
+
+@db_cli.command("render-markdown")
+@click.option("--batch-size", default=500, show_default=True)
+def render_markdown_command(batch_size):
+    click.echo(f"Rendered Markdown on {render_markdown(batch_size)} documents")
+
+
+@db_cli.command("rebuild-tag-counts")
+def rebuild_tag_counts_command():
+    click.echo(f"Counted {tags.rebuild_counts()} tags")
+
+
+@db_cli.command("compute-trending")
+@click.option("--half-life-hours", default=24.0, show_default=True)
+@click.option("--size", default=100, show_default=True)
+def compute_trending_command(half_life_hours, size):
+    click.echo(
+        f"Stored {view_counts.compute_trending(half_life_hours, size)} trending blogs"
+    )
+
+
+@db_cli.command("backfill-summaries")
+@click.option("--batch-size", default=500, show_default=True)
+def backfill_summaries_command(batch_size):
+    click.echo(f"Backfilled summaries on {backfill_summaries(batch_size)} blogs")
@@ -1,25 +1,80 @@
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import base64
+import datetime
+import logging
+import threading
 
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 
 
-def load_credentials_from_file(token_file_path):
-    creds = Credentials.from_authorized_user_file(
-        token_file_path, ["https://www.googleapis.com/auth/gmail.send"]
+SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialHolder:
+    """Shares one set of Gmail OAuth credentials between threads.
+
+    :meth:`refresh_if_needed` renews the access token ``refresh_margin``
+    seconds before it expires, so the mail dispatcher refreshes it in the
+    background instead of a send stalling on an expired token.
+    """
+
+    def __init__(self, credentials, refresh_margin=300):
+        self.credentials = credentials
+        self.refresh_margin = datetime.timedelta(seconds=refresh_margin)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, token_dict, **kwargs):
+        return cls(Credentials.from_authorized_user_info(token_dict, SCOPES), **kwargs)
+
+    def needs_refresh(self) -> bool:
+        if not self.credentials.refresh_token:
+            return False
+        expiry = self.credentials.expiry
+        return (
+            expiry is None or expiry - datetime.datetime.utcnow() < self.refresh_margin
+        )
+
+    def refresh_if_needed(self) -> bool:
+        """Refresh the access token if it is close to expiring.
+
+        Returns:
+          Whether the token was refreshed.
+        """
+        with self._lock:
+            if not self.needs_refresh():
+                return False
+            self.credentials.refresh(Request())
+            logger.info("Refreshed the Gmail access token")
+            return True
+
+    def build_service(self):
+        return build_service(self.credentials)
+
+
+def build_service(credentials):
+    """Build a Gmail API client from the discovery document bundled with
+    google-api-python-client, so no network request is made."""
+    return build(
+        "gmail",
+        "v1",
+        credentials=credentials,
+        static_discovery=True,
+        cache_discovery=False,
     )
-    creds = build("gmail", "v1", credentials=creds)
-    return creds
+
+
+def load_credentials_from_file(token_file_path):
+    return build_service(Credentials.from_authorized_user_file(token_file_path, SCOPES))
 
 
 def load_credentials_from_dict(token_dict):
-    creds = Credentials.from_authorized_user_info(
-        token_dict, ["https://www.googleapis.com/auth/gmail.send"]
-    )
-    creds = build("gmail", "v1", credentials=creds)
-    return creds
+    return build_service(Credentials.from_authorized_user_info(token_dict, SCOPES))
 
 
 def create_message(sender, receiver, subject, message_text, message_html=None):
@@ -0,0 +1,95 @@
+import datetime
+import hashlib
+import os
+
+from flask import current_app, make_response, request, session
+
+from blogger101 import auth
+
+# Browsers and the CDN may store these, but have to revalidate on every use
+PUBLIC_POLICY = "public, no-cache"
+# Pages that show a logged in user's name only stay in their browser
+PRIVATE_POLICY = "private, no-cache"
+# Pages carrying a flashed message are only ever shown once
+UNCACHEABLE_POLICY = "no-store"
+
+DEFAULT_SURROGATE_MAX_AGE = 60
+
+# Set on Heroku by the runtime dyno metadata feature, so that a deploy with
+# new templates does not leave clients holding pages rendered by the old ones
+RELEASE = os.environ.get("HEROKU_RELEASE_VERSION", "")
+
+
+def make_etag(*parts) -> str:
+    return hashlib.sha256(
+        "\x1f".join(str(part) for part in parts).encode()
+    ).hexdigest()[:32]
+
+
+def last_modified(blog: dict):
+    """When ``blog`` last changed. Blogs written before ``updated_at`` was
+    stamped on every write fall back to their release time."""
+    return blog.get("updated_at") or blog.get("released_at")
+
+
+def _matching_etag(etag: str):
+    if request.if_none_match.star_tag:
+        return etag
+    # compression appends the encoding to strong ETags ("etag:gzip")
+    for tag in request.if_none_match.as_set():
+        if tag == etag or tag.startswith(f"{etag}:"):
+            return tag
+    return None
+
+
+def _apply_policy(response, policy: str):
+    response.headers["Cache-Control"] = policy
+    if policy == PUBLIC_POLICY:
+        max_age = current_app.config.get("SURROGATE_MAX_AGE", DEFAULT_SURROGATE_MAX_AGE)
+        response.headers["Surrogate-Control"] = f"max-age={max_age}"
+    else:
+        response.headers["Surrogate-Control"] = "no-store"
+
+
+def conditional_response(etag: str, modified_at, render, personal=False):
+    """Answer a GET with 304 Not Modified when the client's copy is current,
+    and with the response ``render()`` builds otherwise.
+
+    ``etag`` has to change whenever the rendered body would. ``personal``
+    responses also depend on who is logged in, so their ETag is tied to the
+    user and they are kept out of shared caches.
+    """
+    if session.get("_flashes"):
+        response = make_response(render())
+        _apply_policy(response, UNCACHEABLE_POLICY)
+        return response
+
+    logged_in = personal and auth.logged_in(session)
+    etag = make_etag(
+        etag, RELEASE, session["logged_in"]["username"] if logged_in else ""
+    )
+    if modified_at is not None:
+        modified_at = modified_at.replace(microsecond=0, tzinfo=datetime.timezone.utc)
+
+    # If-Modified-Since is only consulted when there is no If-None-Match
+    if request.if_none_match:
+        matched = _matching_etag(etag)
+    elif (
+        modified_at is not None
+        and request.if_modified_since is not None
+        and modified_at <= request.if_modified_since
+    ):
+        matched = etag
+    else:
+        matched = None
+
+    if matched is not None:
+        response = make_response("", 304)
+        response.set_etag(matched)
+    else:
+        response = make_response(render())
+        response.set_etag(etag)
+    if modified_at is not None:
+        response.last_modified = modified_at
+    _apply_policy(response, PRIVATE_POLICY if logged_in else PUBLIC_POLICY)
+    return response
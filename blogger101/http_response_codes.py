@@ -1,3 +1,7 @@
 OK = 200
+BAD_REQUEST = 400
 USER_NOT_FOUND = INCORRECT_PASSWORD = 401
 RESOURCE_NOT_FOUND = 404
+GONE = 410
+REQUEST_TOO_LARGE = 413
+SERVICE_UNAVAILABLE = 503
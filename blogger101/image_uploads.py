@@ -0,0 +1,220 @@
+import concurrent.futures
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+import requests
+
+from blogger101 import cache
+from blogger101.app_extensions import mongo
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+IMGUR_UPLOAD_URL = "https://api.imgur.com/3/image"
+
+CHUNK_SIZE = 64 * 1024
+
+# Longest side in pixels. Cards are 12em wide, so twice that covers HiDPI screens.
+VARIANT_SIZES = {"card": 384, "full": 1600}
+
+VARIANT_FORMATS = {"WEBP": ".webp", "JPEG": ".jpg"}
+
+
+def make_variants(path, image_format="WEBP", sizes=VARIANT_SIZES) -> dict:
+    """Write a downscaled copy of the image at ``path`` for every entry of
+    ``sizes`` and return the temporary file path of each one.
+
+    Raises PIL.UnidentifiedImageError if the file is not an image.
+    """
+    variants = {}
+    try:
+        with Image.open(path) as image:
+            # Lets the JPEG decoder skip straight to a smaller scale
+            image.draft("RGB", (max(sizes.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA") or image_format == "JPEG":
+                image = image.convert("RGB")
+            for name, size in sizes.items():
+                variant = image.copy()
+                variant.thumbnail((size, size))
+                with tempfile.NamedTemporaryFile(
+                    suffix=VARIANT_FORMATS[image_format], delete=False
+                ) as variant_file:
+                    variants[name] = variant_file.name
+                    variant.save(variant_file, image_format, quality=82)
+    except BaseException:
+        for variant_path in variants.values():
+            os.remove(variant_path)
+        raise
+    return variants
+
+
+class ImgurImageStore:
+    def __init__(self, client_id, timeout=30):
+        self.client_id = client_id
+        self.timeout = timeout
+
+    def save(self, path, filename) -> str:
+        with open(path, "rb") as image_file:
+            response = requests.post(
+                IMGUR_UPLOAD_URL,
+                headers={"Authorization": f"Client-ID {self.client_id}"},
+                files={"image": (filename, image_file)},
+                timeout=self.timeout,
+            )
+        response.raise_for_status()
+        return response.json()["data"]["link"]
+
+
+class LocalImageStore:
+    """Copies images into ``directory``. They are served by the
+    ``routes.uploaded_image`` route."""
+
+    def __init__(self, directory, url_prefix="/uploads/"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, path, filename) -> str:
+        name = uuid.uuid4().hex + os.path.splitext(filename)[1].lower()
+        shutil.copyfile(path, os.path.join(self.directory, name))
+        return self.url_prefix + name
+
+
+class ImageUploader:
+    """Uploads blog images in a background thread pool.
+
+    The request handler spools the upload to a temporary file and returns as
+    soon as the blog is inserted with ``image_status: pending``. A pool
+    thread then downscales it into ``VARIANT_SIZES``, hands the variants to
+    the configured store, retrying with backoff, and patches the blog's
+    ``image`` (full size) and ``image_card`` once the upload finishes.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.store = None
+        self._executor = None
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("IMAGE_STORE", "imgur")
+        app.config.setdefault(
+            "IMAGE_UPLOAD_FOLDER", os.path.join(app.instance_path, "uploads")
+        )
+        app.config.setdefault("IMAGE_UPLOAD_WORKERS", 2)
+        app.config.setdefault("IMAGE_UPLOAD_ATTEMPTS", 3)
+        app.config.setdefault("IMAGE_UPLOAD_BACKOFF", 2)
+        app.config.setdefault("IMAGE_VARIANT_FORMAT", "WEBP")
+        self.store = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=int(app.config["IMAGE_UPLOAD_WORKERS"]),
+            thread_name_prefix="image-upload",
+        )
+
+    def get_store(self):
+        if self.store is None:
+            if self.app.config["IMAGE_STORE"] == "local":
+                self.store = LocalImageStore(self.app.config["IMAGE_UPLOAD_FOLDER"])
+            else:
+                self.store = ImgurImageStore(self.app.config["IMGUR_ID"])
+        return self.store
+
+    def spool(self, file_storage) -> str:
+        """Copy an upload to a temporary file and return its path, so that it
+        outlives the request. Call before saving the blog it belongs to."""
+        suffix = os.path.splitext(file_storage.filename or "")[1].lower()
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spooled:
+            shutil.copyfileobj(file_storage.stream, spooled, CHUNK_SIZE)
+        return spooled.name
+
+    def submit(self, blog_id, path):
+        """Upload the image spooled at ``path`` for the blog ``blog_id``."""
+        future = self._executor.submit(self._upload, blog_id, path)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def wait(self, timeout=None):
+        """Block until every submitted upload has finished."""
+        with self._lock:
+            futures = list(self._futures)
+        concurrent.futures.wait(futures, timeout)
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _upload(self, blog_id, path):
+        try:
+            variants = make_variants(path, self.app.config["IMAGE_VARIANT_FORMAT"])
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            self.app.logger.warning(
+                "The image of blog %s could not be resized, uploading it as is",
+                blog_id,
+            )
+            variants = {"full": path}
+        else:
+            os.remove(path)
+
+        attempts = int(self.app.config["IMAGE_UPLOAD_ATTEMPTS"])
+        links = {}
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    # A retry only uploads the variants that are still missing
+                    for name, variant_path in variants.items():
+                        if name not in links:
+                            links[name] = self.get_store().save(
+                                variant_path, os.path.basename(variant_path)
+                            )
+                except Exception:
+                    self.app.logger.exception(
+                        "Uploading the image of blog %s failed (attempt %d of %d)",
+                        blog_id,
+                        attempt,
+                        attempts,
+                    )
+                    if attempt < attempts:
+                        time.sleep(
+                            float(self.app.config["IMAGE_UPLOAD_BACKOFF"])
+                            * 2 ** (attempt - 1)
+                        )
+                    continue
+                update = {
+                    "image": links["full"],
+                    "image_status": DONE,
+                    "updated_at": datetime.datetime.utcnow(),
+                }
+                if "card" in links:
+                    update["image_card"] = links["card"]
+                mongo.db.blogs.update_one({"_id": blog_id}, {"$set": update})
+                cache.blog_listing.bump()
+                return links
+            mongo.db.blogs.update_one(
+                {"_id": blog_id},
+                {
+                    "$set": {
+                        "image_status": FAILED,
+                        "updated_at": datetime.datetime.utcnow(),
+                    }
+                },
+            )
+        finally:
+            for variant_path in variants.values():
+                os.remove(variant_path)
+
+
+uploader = ImageUploader()
@@ -0,0 +1,230 @@
+import base64
+import datetime
+import json
+import urllib.parse
+
+from bson.objectid import ObjectId
+from flask import current_app
+from pymongo import DESCENDING
+
+# The legacy string columns are written as "%m/%d/%Y" + "%H:%M:%S:%f"
+LEGACY_RELEASE_FORMAT = "%m/%d/20%y%H:%M:%S:%f"
+
+NEWEST_FIRST = [("released_at", DESCENDING), ("_id", DESCENDING)]
+
+# The fields the blog cards in blogs.html and myblogs.html render
+CARD_FIELDS = {
+    "title": True,
+    "user": True,
+    "link": True,
+    "date_released": True,
+    "released_at": True,
+    "image": True,
+    "image_card": True,
+}
+
+# Drops the post body and comment ids from list views
+SUMMARY_FIELDS = {
+    "text": False,
+    "html": False,
+    "content_hash": False,
+    "comments": False,
+    # View counts change without updated_at, which the listing validators
+    # are built from. /api/v1/trending serves them.
+    "views": False,
+}
+
+# The fields ?fields= can ask the list APIs for. _id is always included.
+SELECTABLE_FIELDS = {
+    "title",
+    "user",
+    "name",
+    "link",
+    "date_released",
+    "time_released",
+    "released_at",
+    "updated_at",
+    "image",
+    "image_card",
+    "image_status",
+    "excerpt",
+    "word_count",
+    "comment_count",
+    "tags",
+    "content_hash",
+    "text",
+    "html",
+    "comments",
+}
+
+# The bulk export leaves out the rendered HTML, clients have the Markdown,
+# and the view counts like SUMMARY_FIELDS
+EXPORT_FIELDS = {"html": False, "views": False}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+EXPORT_BATCH_SIZE = 200
+# Compression flushes every chunk, so a chunk per blog would compress badly
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def released_at_from_strings(date_released: str, time_released: str):
+    return datetime.datetime.strptime(
+        date_released + time_released, LEGACY_RELEASE_FORMAT
+    )
+
+
+def to_json(blog: dict, relative=False) -> dict:
+    blog["_id"] = str(blog["_id"])
+    for field in ("released_at", "updated_at"):
+        if field in blog:
+            blog[field] = blog[field].isoformat()
+    if not relative and "link" in blog:
+        blog["link"] = urllib.parse.urljoin(
+            "https://blogger-101.herokuapp.com", blog["link"]
+        )
+    return blog
+
+
+def encode_token(values: list) -> str:
+    """Pack JSON ``values`` into an opaque, URL safe token."""
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> list:
+    padded = token + "=" * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_position(when: datetime.datetime, _id) -> str:
+    return encode_token([when.isoformat(), str(_id)])
+
+
+def encode_cursor(blog: dict) -> str:
+    return encode_position(blog["released_at"], blog["_id"])
+
+
+def decode_cursor(cursor: str):
+    try:
+        released_at, _id = decode_token(cursor)
+        return datetime.datetime.fromisoformat(released_at), ObjectId(_id)
+    except Exception as error:
+        raise InvalidCursor(cursor) from error
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE) -> int:
+    if value is None:
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError(value)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(value, default=None):
+    """Turn a comma separated ``?fields=`` value into a Mongo projection, so
+    that only the requested fields are read and sent."""
+    if value is None:
+        return default
+    fields = {field.strip() for field in value.split(",") if field.strip()}
+    if not fields or not fields <= SELECTABLE_FIELDS:
+        raise InvalidFields(value)
+    return {field: True for field in fields}
+
+
+def after_cursor(query: dict, cursor: str) -> dict:
+    """Restrict a query to the documents after ``cursor`` in NEWEST_FIRST order.
+
+    The (released_at, _id) pair is unique, so keyset pagination never skips or
+    repeats a blog even when several share the same release time.
+    """
+    released_at, _id = decode_cursor(cursor)
+    return {
+        "$and": [
+            query,
+            {
+                "$or": [
+                    {"released_at": {"$lt": released_at}},
+                    {"released_at": released_at, "_id": {"$lt": _id}},
+                ]
+            },
+        ]
+    }
+
+
+def find_page(collection, query: dict, limit: int, after=None, projection=None):
+    """Return one page of ``collection`` in NEWEST_FIRST order and the next cursor.
+
+    One extra document is fetched to find out whether another page exists, so
+    the cost of a request is bounded by ``limit`` rather than the collection size.
+    Blogs that have not been backfilled with ``released_at`` are not paginated.
+    """
+    query = {"$and": [query, {"released_at": {"$exists": True}}]}
+    if projection and any(
+        included for field, included in projection.items() if field != "_id"
+    ):
+        # The cursor is built from released_at
+        projection = {**projection, "released_at": True}
+    if after:
+        query = after_cursor(query, after)
+    blogs = list(collection.find(query, projection).sort(NEWEST_FIRST).limit(limit + 1))
+    next_cursor = encode_cursor(blogs[limit - 1]) if len(blogs) > limit else None
+    return blogs[:limit], next_cursor
+
+
+def latest_change(collection, tombstones):
+    """The blog count in ``collection`` and the time of its newest write or
+    deletion, from ``updated_at`` and the ``deleted_at`` of ``tombstones``.
+
+    Every write stamps ``updated_at`` and every deletion leaves a tombstone,
+    so the pair changes whenever a listing would. Both come from indexes and
+    the collection metadata, without reading the blogs themselves.
+    """
+    newest = collection.find_one(
+        {"updated_at": {"$exists": True}},
+        {"updated_at": True},
+        sort=[("updated_at", DESCENDING)],
+    )
+    deleted = tombstones.find_one(
+        {}, {"deleted_at": True}, sort=[("deleted_at", DESCENDING)]
+    )
+    times = [newest["updated_at"]] if newest is not None else []
+    if deleted is not None:
+        times.append(deleted["deleted_at"])
+    return collection.estimated_document_count(), max(times, default=None)
+
+
+def export_chunks(cursor, relative=False, ndjson=False):
+    """Serialize the blogs of ``cursor`` one at a time, as a JSON array or as
+    one JSON document per line, and yield the text in chunks of about
+    EXPORT_CHUNK_SIZE bytes.
+
+    Only one Mongo batch and one chunk are held at a time, however many
+    blogs there are.
+    """
+    buffer = [] if ndjson else ["["]
+    size = 0
+    for position, blog in enumerate(cursor):
+        document = current_app.json.dumps(to_json(blog, relative))
+        if ndjson:
+            buffer.append(document + "\n")
+        else:
+            buffer.append("," + document if position else document)
+        size += len(document)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if not ndjson:
+        buffer.append("]")
+    if buffer:
+        yield "".join(buffer)
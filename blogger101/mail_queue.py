@@ -0,0 +1,253 @@
+import collections
+import datetime
+import threading
+import time
+
+from pymongo import ReturnDocument
+
+from blogger101 import email_oauth
+from blogger101.app_extensions import mongo
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Sent and failed messages are kept this long, without their body, for the
+# delivery history
+MAIL_HISTORY = datetime.timedelta(days=7)
+
+
+class StubTransport:
+    """Keeps messages in ``outbox`` instead of sending them."""
+
+    def __init__(self):
+        self.outbox = []
+
+    def refresh(self):
+        pass
+
+    def send_batch(self, messages: list) -> list:
+        self.outbox.extend(messages)
+        return [None] * len(messages)
+
+
+class GmailTransport:
+    """Sends messages through the Gmail API, several per HTTP request."""
+
+    def __init__(self, service, credentials):
+        self.service = service
+        self.credentials = credentials
+
+    def refresh(self):
+        self.credentials.refresh_if_needed()
+
+    def send_batch(self, messages: list) -> list:
+        """Send ``messages`` and return the exception (or None) for each one."""
+        self.refresh()
+        errors = [None] * len(messages)
+
+        def callback(request_id, response, exception):
+            errors[int(request_id)] = exception
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for index, message in enumerate(messages):
+            batch.add(
+                self.service.users().messages().send(userId="me", body=message),
+                request_id=str(index),
+            )
+        batch.execute()
+        return errors
+
+
+class SendMetrics:
+    """Latency of the most recent ``window`` batch sends, in milliseconds."""
+
+    def __init__(self, window=500):
+        self.batches = 0
+        self.messages = 0
+        self.latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, messages: int):
+        with self._lock:
+            self.batches += 1
+            self.messages += messages
+            self.latencies.append(seconds * 1000)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            batches, messages = self.batches, self.messages
+        if not latencies:
+            return {"batches": batches, "messages": messages}
+        return {
+            "batches": batches,
+            "messages": messages,
+            "mean_ms": sum(latencies) / len(latencies),
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+            "max_ms": latencies[-1],
+        }
+
+
+class MailDispatcher:
+    """Delivers the messages queued in the ``outbound_mail`` collection.
+
+    Request handlers only insert a document and return. A background thread
+    in each worker claims due messages in batches, sends them, and reschedules
+    failures with exponential backoff. Claims expire after ``lease`` seconds, so
+    messages held by a worker that died are picked up again by another one.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.stub_transport = StubTransport()
+        self.metrics = SendMetrics()
+        self._gmail_transport = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("MAIL_TRANSPORT", "gmail")
+        app.config.setdefault("MAIL_DISPATCHER_THREAD", True)
+        app.config.setdefault("MAIL_BATCH_SIZE", 10)
+        app.config.setdefault("MAIL_MAX_ATTEMPTS", 5)
+        app.config.setdefault("MAIL_RETRY_BACKOFF", 30)
+        app.config.setdefault("MAIL_POLL_INTERVAL", 60)
+        app.config.setdefault("MAIL_LEASE", 300)
+        self._gmail_transport = None
+        # Retries and messages left behind by a worker that died are due
+        # whether or not this worker queues anything new
+        if self.threaded:
+            self.start()
+
+    @property
+    def threaded(self) -> bool:
+        return str(self.app.config["MAIL_DISPATCHER_THREAD"]).lower() in ("1", "true")
+
+    @property
+    def transport(self):
+        if self.app.config["MAIL_TRANSPORT"] == "stub":
+            return self.stub_transport
+        if self._gmail_transport is None:
+            self._gmail_transport = GmailTransport(
+                self.app.config["GMAIL_API_Creds"],
+                self.app.config["GMAIL_Credentials"],
+            )
+        return self._gmail_transport
+
+    def enqueue(self, receiver, subject, message_text, message_html=None):
+        now = datetime.datetime.utcnow()
+        _id = mongo.db.outbound_mail.insert_one(
+            {
+                "message": email_oauth.create_message(
+                    f"Blogger101 <{self.app.config['EMAIL_SENDER']}>",
+                    receiver,
+                    subject,
+                    message_text,
+                    message_html,
+                ),
+                "status": PENDING,
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now,
+            }
+        ).inserted_id
+        if self.threaded:
+            self.start()
+            self._wake.set()
+        return _id
+
+    def claim_batch(self) -> list:
+        now = datetime.datetime.utcnow()
+        claimed = []
+        while len(claimed) < int(self.app.config["MAIL_BATCH_SIZE"]):
+            mail = mongo.db.outbound_mail.find_one_and_update(
+                {
+                    "$or": [
+                        {"status": PENDING, "next_attempt_at": {"$lte": now}},
+                        {"status": SENDING, "locked_until": {"$lte": now}},
+                    ]
+                },
+                {
+                    "$set": {
+                        "status": SENDING,
+                        "locked_until": now
+                        + datetime.timedelta(
+                            seconds=float(self.app.config["MAIL_LEASE"])
+                        ),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if mail is None:
+                break
+            claimed.append(mail)
+        return claimed
+
+    def run_once(self) -> int:
+        """Send one batch of due messages and return how many were claimed."""
+        batch = self.claim_batch()
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        try:
+            errors = self.transport.send_batch([mail["message"] for mail in batch])
+            elapsed = time.perf_counter() - started
+            self.metrics.record(elapsed, len(batch))
+            self.app.logger.info(
+                "Sent %d emails in %.0f ms", len(batch), elapsed * 1000
+            )
+        except Exception as error:
+            self.app.logger.exception("Sending a batch of emails failed")
+            errors = [error] * len(batch)
+
+        now = datetime.datetime.utcnow()
+        for mail, error in zip(batch, errors):
+            unset = {"locked_until": ""}
+            if error is None:
+                update = {"status": SENT, "sent_at": now, "finished_at": now}
+            elif mail["attempts"] >= int(self.app.config["MAIL_MAX_ATTEMPTS"]):
+                update = {"status": FAILED, "error": str(error), "finished_at": now}
+            else:
+                delay = float(self.app.config["MAIL_RETRY_BACKOFF"]) * 2 ** (
+                    mail["attempts"] - 1
+                )
+                update = {
+                    "status": PENDING,
+                    "error": str(error),
+                    "next_attempt_at": now + datetime.timedelta(seconds=delay),
+                }
+            if "finished_at" in update:
+                # The body holds login and password reset links
+                unset["message"] = ""
+            mongo.db.outbound_mail.update_one(
+                {"_id": mail["_id"]}, {"$set": update, "$unset": unset}
+            )
+        return len(batch)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="mail-dispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.transport.refresh()
+                while self.run_once():
+                    pass
+            except Exception:
+                self.app.logger.exception("The mail dispatcher failed")
+            self._wake.wait(float(self.app.config["MAIL_POLL_INTERVAL"]))
+            self._wake.clear()
+
+
+dispatcher = MailDispatcher()
@@ -0,0 +1,88 @@
+import hashlib
+import html
+
+import bleach
+import markdown
+
+EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+ALLOWED_TAGS = set(bleach.sanitizer.ALLOWED_TAGS) | {
+    "p",
+    "pre",
+    "br",
+    "hr",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "img",
+    "span",
+    "del",
+    "sub",
+    "sup",
+    "table",
+    "thead",
+    "tbody",
+    "tr",
+    "th",
+    "td",
+}
+
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title"],
+    "abbr": ["title"],
+    "acronym": ["title"],
+    "img": ["src", "alt", "title"],
+    # fenced_code puts the language in the class, which highlight.js reads
+    "code": ["class"],
+    "th": ["align"],
+    "td": ["align"],
+}
+
+
+def render(text: str) -> str:
+    """Convert Markdown to HTML that is safe to embed in a page."""
+    return bleach.clean(
+        markdown.markdown(text, extensions=EXTENSIONS),
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=["http", "https", "mailto"],
+    )
+
+
+EXCERPT_LENGTH = 200
+
+
+def plain_text(rendered: str) -> str:
+    return " ".join(
+        html.unescape(bleach.clean(rendered, tags=set(), strip=True)).split()
+    )
+
+
+def excerpt(plain: str, length=EXCERPT_LENGTH) -> str:
+    """The start of ``plain``, cut at a word boundary."""
+    if len(plain) <= length:
+        return plain
+    return plain[:length].rsplit(" ", 1)[0] + "\u2026"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def rendered_fields(text: str) -> dict:
+    """The fields stored next to a Markdown ``text`` on every write.
+
+    ``excerpt`` and ``word_count`` let list views describe a blog without
+    transferring its body.
+    """
+    rendered = render(text)
+    plain = plain_text(rendered)
+    return {
+        "html": rendered,
+        "content_hash": content_hash(text),
+        "excerpt": excerpt(plain),
+        "word_count": len(plain.split()),
+    }
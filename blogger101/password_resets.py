@@ -0,0 +1,53 @@
+import datetime
+import hashlib
+import secrets
+
+from blogger101.app_extensions import mongo
+
+TOKEN_LIFETIME = datetime.timedelta(hours=1)
+
+
+def _token_id(token: str) -> str:
+    # Only the hash is stored, so a leaked collection cannot reset passwords
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _unexpired(token: str) -> dict:
+    return {
+        "_id": _token_id(token),
+        "created_at": {"$gt": datetime.datetime.utcnow() - TOKEN_LIFETIME},
+    }
+
+
+def create(user_id) -> str:
+    """Store a new reset token for ``user_id`` and return it."""
+    token = secrets.token_urlsafe(32)
+    mongo.db.password_resets.insert_one(
+        {
+            "_id": _token_id(token),
+            "user_id": user_id,
+            "created_at": datetime.datetime.utcnow(),
+        }
+    )
+    return token
+
+
+def is_valid(token: str) -> bool:
+    return (
+        mongo.db.password_resets.find_one(_unexpired(token), {"_id": True}) is not None
+    )
+
+
+def consume(token: str):
+    """Use up ``token`` and return the id of its user, or None if the token is
+    unknown, expired or was already used.
+
+    The token is deleted by the same operation that reads it, so two requests
+    racing with one token cannot both succeed. The user's other outstanding
+    tokens are revoked too.
+    """
+    reset = mongo.db.password_resets.find_one_and_delete(_unexpired(token))
+    if reset is None:
+        return None
+    mongo.db.password_resets.delete_many({"user_id": reset["user_id"]})
+    return reset["user_id"]
@@ -0,0 +1,149 @@
+import atexit
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+
+import bcrypt
+
+from blogger101.app_extensions import mongo
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+def hash_rounds(password_hash: str) -> int:
+    """Read the cost factor out of a ``$2b$<rounds>$...`` hash."""
+    return int(password_hash.split("$")[2])
+
+
+def calibrate_rounds(
+    target_seconds: float, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS
+):
+    """Return the highest cost whose hash takes at most ``target_seconds`` on
+    this machine, but never less than ``min_rounds``.
+
+    Only one hash at ``min_rounds`` is timed. Every extra round doubles the
+    work, so the time of the higher costs is extrapolated from it.
+    """
+    started = time.perf_counter()
+    _hash(b"calibration", min_rounds)
+    elapsed = time.perf_counter() - started
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed * 2 <= target_seconds:
+        rounds += 1
+        elapsed *= 2
+    return rounds
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords at the configured bcrypt cost.
+
+    ``BCRYPT_LOG_ROUNDS`` sets the cost. If it is unset and
+    ``BCRYPT_TARGET_SECONDS`` is set, the cost is calibrated at startup so
+    one hash takes about that long. With ``BCRYPT_PROCESS_POOL_SIZE`` above
+    zero, hashing runs in a bounded pool of processes instead of the
+    request's worker. Hashes stored at a different cost are rehashed in the
+    background after a successful login.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._pool = None
+        self._rehash_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="password-rehash"
+        )
+        self._futures = set()
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get("BCRYPT_LOG_ROUNDS"):
+            rounds = int(app.config["BCRYPT_LOG_ROUNDS"])
+        elif app.config.get("BCRYPT_TARGET_SECONDS"):
+            rounds = calibrate_rounds(float(app.config["BCRYPT_TARGET_SECONDS"]))
+            app.logger.info("Calibrated the bcrypt cost to %d rounds", rounds)
+        else:
+            rounds = DEFAULT_ROUNDS
+        app.config["BCRYPT_LOG_ROUNDS"] = rounds
+        app.config["BCRYPT_PROCESS_POOL_SIZE"] = int(
+            app.config.get("BCRYPT_PROCESS_POOL_SIZE") or 0
+        )
+        self.shutdown()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+    @property
+    def rounds(self) -> int:
+        return self.app.config["BCRYPT_LOG_ROUNDS"]
+
+    def _run(self, function, *args):
+        pool_size = self.app.config["BCRYPT_PROCESS_POOL_SIZE"]
+        if not pool_size:
+            return function(*args)
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=pool_size,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+        return self._pool.submit(function, *args).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password.encode(), self.rounds).decode()
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self._run(_check, password.encode(), password_hash.encode())
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return hash_rounds(password_hash) != self.rounds
+
+    def rehash_if_needed(self, user: dict, password: str):
+        """Schedule a rehash of ``user``'s password if it was stored at a
+        different cost. Call only after the password has been verified."""
+        if not self.needs_rehash(user["password"]):
+            return None
+        future = self._rehash_executor.submit(
+            self._rehash, user["_id"], user["password"], password
+        )
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def wait(self, timeout=None):
+        """Block until every scheduled rehash has finished."""
+        with self._lock:
+            futures = list(self._futures)
+        concurrent.futures.wait(futures, timeout)
+
+    def _forget(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _rehash(self, user_id, old_hash, password):
+        try:
+            # Matching on the old hash keeps a concurrent password change intact
+            mongo.db.users.update_one(
+                {"_id": user_id, "password": old_hash},
+                {"$set": {"password": self.hash(password)}},
+            )
+        except Exception:
+            self.app.logger.exception("Rehashing the password of %s failed", user_id)
+
+
+hasher = PasswordHasher()
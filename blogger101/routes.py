@@ -1,5 +1,4 @@
 import datetime
-import base64
 import urllib.parse
 import os
 
@@ -16,17 +15,31 @@ from flask import (
     jsonify,
     url_for,
     send_from_directory,
+    Response,
+    stream_with_context,
 )
 from bson.objectid import ObjectId
-from werkzeug.exceptions import HTTPException
-import requests
+from pymongo.errors import DuplicateKeyError, ExecutionTimeout
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 
 from blogger101 import http_response_codes as status
-from blogger101 import email_oauth
 from blogger101 import auth
+from blogger101 import cache
+from blogger101 import changes
+from blogger101 import comments
+from blogger101 import http_caching
+from blogger101 import image_uploads
+from blogger101 import listing
+from blogger101 import mail_queue
+from blogger101 import markdown_render
+from blogger101 import password_resets
+from blogger101 import passwords
+from blogger101 import search
+from blogger101 import static_assets
+from blogger101 import tags
+from blogger101 import view_counts
 from blogger101.app_extensions import (
     mongo,
-    flask_bcrypt,
     serializer,
 )
 
@@ -46,8 +59,17 @@ def send_android_app_link_file():
     return send_from_directory("static", "assetlinks.json")
 
 
+def _sees_shared_page() -> bool:
+    """Whether this visitor gets the same HTML as every anonymous visitor."""
+    return not auth.logged_in(session) and not session.get("_flashes")
+
+
 @bp.route("/")
 def blogs():
+    if _sees_shared_page():
+        return cache.pages.get_or_set(
+            ("blogs",), lambda: render_template("blogs.html", login_status=None)
+        )
     return render_template(
         "blogs.html",
         login_status=session["logged_in"] if auth.logged_in(session) else None,
@@ -57,8 +79,20 @@ def blogs():
 @bp.route("/myblogs")
 def myblogs():
     if auth.logged_in(session):
+        try:
+            user_blogs, next_cursor = listing.find_page(
+                mongo.db.blogs,
+                {"user": session["logged_in"]["username"]},
+                listing.DEFAULT_PAGE_SIZE,
+                request.args.get("after"),
+                listing.SUMMARY_FIELDS,
+            )
+        except listing.InvalidCursor:
+            abort(400)
         return render_template(
             "myblogs.html",
+            blogs=user_blogs,
+            next_cursor=next_cursor,
             login_status=session["logged_in"] if auth.logged_in(session) else None,
         )
     flash(
@@ -72,15 +106,14 @@ def myblogs():
 @bp.route("/delete/<title>")
 def delete_blog(title):
     if auth.logged_in(session):
-        if (
-            mongo.db.blogs.find_one(
-                {"title": title, "user": session["logged_in"]["username"]}
-            )
-            is not None
-        ):
-            mongo.db.blogs.delete_one(
-                {"title": title, "user": session["logged_in"]["username"]}
-            )
+        blog = mongo.db.blogs.find_one_and_delete(
+            {"title": title, "user": session["logged_in"]["username"]},
+            {"_id": True, "tags": True},
+        )
+        if blog is not None:
+            changes.record_deletion(blog["_id"])
+            tags.update_counts(removed=blog.get("tags", []))
+            cache.blog_listing.bump()
             flash("Blog Has Been Deleted")
         else:
             flash("Blog Not Found")
@@ -120,8 +153,17 @@ def edit_blog(title):
             ):
                 mongo.db.blogs.update_one(
                     {"title": title, "user": session["logged_in"]["username"]},
-                    {"$set": {"text": request.form["blog_content"]}},
+                    {
+                        "$set": {
+                            "text": request.form["blog_content"],
+                            **markdown_render.rendered_fields(
+                                request.form["blog_content"]
+                            ),
+                            "updated_at": datetime.datetime.utcnow(),
+                        }
+                    },
                 )
+                cache.blog_listing.bump()
                 flash("Blog Has Been Updated")
             else:
                 flash("Blog Not Found")
@@ -167,20 +209,17 @@ def forgot_password():
         if user is None:
             flash("Email not found")
             return redirect("/forgot_password")
-        token = serializer.dumps(user["password"], "change-password")
+        token = password_resets.create(user["_id"])
         confirm_link = url_for("routes.change_password", token=token, _external=True)
-        email_oauth.send_message(
-            current_app.config["GMAIL_API_Creds"],
-            email_oauth.create_message(
-                f"Blogger101 <{current_app.config['EMAIL_SENDER']}>",
-                email,
-                "Blogger101 Password Change Confirmation",
-                f"Go to {confirm_link} to change your password",
-                f"<a href='{confirm_link}'>Change Password<a>",
-            ),
+        mail_queue.dispatcher.enqueue(
+            email,
+            "Blogger101 Password Change Confirmation",
+            f"Go to {confirm_link} to change your password",
+            f"<a href='{confirm_link}'>Change Password<a>",
         )
 
-        return redirect(f"/change_password_email_sent/{token}")
+        email_token = serializer.dumps(email, "change-password")
+        return redirect(f"/change_password_email_sent/{email_token}")
 
 
 @bp.route("/change_password_email_sent/<token>")
@@ -196,22 +235,31 @@ def change_password_email_sent(token):
 @bp.route("/change_password/<token>", methods=["GET", "POST"])
 def change_password(token):
     if request.method == "GET":
+        if not password_resets.is_valid(token):
+            flash("This Password Reset Link Has Expired or Was Already Used")
+            return redirect("/forgot_password")
         return render_template(
             "change_password.html",
             login_status=session["logged_in"] if auth.logged_in(session) else None,
         )
     elif request.method == "POST":
-        password_hash = serializer.loads(token, salt="change-password", max_age=3600)
         password = request.form.get("password")
         confirm_password = request.form.get("confirm_password")
+        if not password:
+            flash("Please Enter a New Password")
+            return redirect(request.url)
         if password != confirm_password:
             flash("Password Does Not Match Confirm Password")
             return redirect(request.url)
+        user_id = password_resets.consume(token)
+        if user_id is None:
+            flash("This Password Reset Link Has Expired or Was Already Used")
+            return redirect("/forgot_password")
         mongo.db.users.update_one(
-            {"password": password_hash},
+            {"_id": user_id},
             {
                 "$set": {
-                    "password": flask_bcrypt.generate_password_hash(password).decode(),
+                    "password": passwords.hasher.hash(password),
                 }
             },
         )
@@ -219,22 +267,72 @@ def change_password(token):
         return redirect("/")
 
 
-@bp.route("/blog/<page>/")
-def blog_page(page):
+def _load_blog_page(page):
+    """Find a blog and return its id, its ETag, its Last-Modified and a
+    function rendering its page."""
     results = mongo.db.blogs.find_one({"name": f"{page}.html"})
     if results is None:
         abort(404)
-    elif "logged_in" not in session or session["logged_in"] is None:
-        return render_template("blog_template.html", results=results, login_status=None)
-    else:
-        results["text"] = Markup(results["text"])
-        return render_template(
-            "blog_template.html", results=results, login_status=session["logged_in"]
+    if "html" not in results:
+        rendered = {
+            **markdown_render.rendered_fields(results["text"]),
+            "updated_at": datetime.datetime.utcnow(),
+        }
+        mongo.db.blogs.update_one({"_id": results["_id"]}, {"$set": rendered})
+        results.update(rendered)
+    modified_at = http_caching.last_modified(results)
+    etag = http_caching.make_etag(
+        results["content_hash"], results["title"], results["image"], modified_at
+    )
+    return (
+        results["_id"],
+        etag,
+        modified_at,
+        lambda: render_template(
+            "blog_template.html",
+            results=results,
+            login_status=session["logged_in"] if auth.logged_in(session) else None,
+        ),
+    )
+
+
+@bp.route("/blog/<page>/")
+def blog_page(page):
+    if _sees_shared_page():
+
+        def load():
+            blog_id, etag, modified_at, render = _load_blog_page(page)
+            return blog_id, etag, modified_at, render()
+
+        blog_id, etag, modified_at, html = cache.pages.get_or_set(
+            ("blog_page", page), load
+        )
+        view_counts.counter.record(blog_id)
+        return http_caching.conditional_response(
+            etag, modified_at, lambda: html, personal=True
         )
+    blog_id, etag, modified_at, render = _load_blog_page(page)
+    view_counts.counter.record(blog_id)
+    return http_caching.conditional_response(etag, modified_at, render, personal=True)
 
 
 @bp.route("/user/<user>/")
 def user_page(user):
+    if _sees_shared_page():
+
+        def load():
+            results = mongo.db.users.find_one({"username": user})
+            # A not found page would go stale as soon as the user signs up
+            if results is None:
+                return None
+            return render_template(
+                "user_template.html", results_from_user=results, login_status=None
+            )
+
+        html = cache.pages.get_or_set(("user_page", user), load)
+        if html is not None:
+            return html
+
     results = mongo.db.users.find_one({"username": user})
     if auth.logged_in(session):
         return render_template(
@@ -266,14 +364,13 @@ def sign_up():
                 "last_name": request.form.get("last_name"),
                 "username": request.form.get("username"),
                 "email": request.form.get("email").lower(),
-                "password": flask_bcrypt.generate_password_hash(
-                    request.form.get("password")
-                ).decode(),
+                "password": passwords.hasher.hash(request.form.get("password")),
+                "created_at": datetime.datetime.utcnow(),
             }
 
             if (
                 mongo.db.users.find_one(
-                    {"email": doc["email"], "username": doc["username"]}
+                    {"$or": [{"email": doc["email"]}, {"username": doc["username"]}]}
                 )
                 is None
             ):
@@ -281,15 +378,11 @@ def sign_up():
                 confirm_link = url_for(
                     "routes.confirm_email", token=token, _external=True
                 )
-                email_oauth.send_message(
-                    current_app.config["GMAIL_API_Creds"],
-                    email_oauth.create_message(
-                        f"Blogger101 <{current_app.config['EMAIL_SENDER']}>",
-                        doc["email"],
-                        "Blogger101 Email Confirmation",
-                        f"Go to {confirm_link} to verify your email",
-                        f"<a href='{confirm_link}'>Verify Email<a>",
-                    ),
+                mail_queue.dispatcher.enqueue(
+                    doc["email"],
+                    "Blogger101 Email Confirmation",
+                    f"Go to {confirm_link} to verify your email",
+                    f"<a href='{confirm_link}'>Verify Email<a>",
                 )
 
                 mongo.db.unverified_users.insert_one(doc)
@@ -306,6 +399,13 @@ def sign_up():
             return redirect("/sign_up")
 
 
+def _already_registered(user) -> str:
+    """Which of the email and username of ``user`` another account has."""
+    if mongo.db.users.find_one({"email": user["email"]}, {"_id": True}) is not None:
+        return "email"
+    return "username"
+
+
 @bp.route("/confirm/<token>")
 def confirm_email(token):
     email = serializer.loads(token, salt="email-confirm", max_age=3600)
@@ -313,14 +413,16 @@ def confirm_email(token):
     if unverified_user is not None:
         del unverified_user["_id"]
         mongo.db.unverified_users.delete_one(unverified_user)
-        mongo.db.users.insert_one(unverified_user)
-
-        session["logged_in"] = {
-            "first_name": unverified_user["first_name"],
-            "last_name": unverified_user["last_name"],
-            "email": unverified_user["email"],
-            "username": unverified_user["username"],
-        }
+        try:
+            mongo.db.users.insert_one(unverified_user)
+        except DuplicateKeyError:
+            # Another account took the email or username after the sign up
+            if _already_registered(unverified_user) == "email":
+                flash("An Account is Already Registered with that Email")
+            else:
+                flash("An Account is Already Registered with that Username")
+            return redirect("/sign_up")
+        auth.log_in(session, unverified_user)
 
         flash("Successfully Signed Up")
         return redirect("/")
@@ -333,12 +435,7 @@ def confirm_login(token):
     email = serializer.loads(token, salt="email-confirm", max_age=3600)
     user = mongo.db.users.find_one({"email": email})
     if user is not None:
-        session["logged_in"] = {
-            "first_name": user["first_name"],
-            "last_name": user["last_name"],
-            "email": user["email"],
-            "username": user["username"],
-        }
+        auth.log_in(session, user)
 
         flash("Successfully Logged Up")
         return redirect("/")
@@ -366,52 +463,24 @@ def login():
     elif request.method == "POST":
         email = request.form.get("email").lower()
         password = request.form.get("password")
-        recaptcha_response = (
-            {"score": 1}
-            if current_app.config["TESTING"]
-            else requests.post(
-                "https://www.google.com/recaptcha/api/siteverify",
-                params={
-                    "secret": current_app.config["RECAPTCHA_SECRETKEY"],
-                    "response": request.form.get("token"),
-                },
-            ).json()
-        )
-
-        login_response = auth.check_login(email, password)
+        login_response = auth.verify_login(email, password, request.form.get("token"))
         if login_response["error"]:
             flash(login_response["message"])
             return redirect("/login")
-        user = login_response["user"]
 
-        if flask_bcrypt.check_password_hash(user["password"], password):
-            if recaptcha_response["score"] < 0.5:
-                token = serializer.dumps(email, "email-confirm")
-                confirm_link = url_for(
-                    "routes.confirm_login", token=token, _external=True
-                )
-                email_oauth.send_message(
-                    current_app.config["GMAIL_API_Creds"],
-                    email_oauth.create_message(
-                        f"Blogger101 <{current_app.config['EMAIL_SENDER']}>",
-                        email,
-                        "Blogger101 Login Confirmation",
-                        f"Go to {confirm_link} to login to your account",
-                        f"<a href='{confirm_link}'>Login to Your Account<a>",
-                    ),
-                )
-                return render_template("verify_login.html")
-            session["logged_in"] = {
-                "first_name": user["first_name"],
-                "last_name": user["last_name"],
-                "email": user["email"],
-                "username": user["username"],
-            }
-            flash("Successfully Logged In")
-            return redirect("/")
-        else:
-            flash("Incorrect Email or Password")
-            return redirect("/login")
+        if not login_response["human"]:
+            token = serializer.dumps(email, "email-confirm")
+            confirm_link = url_for("routes.confirm_login", token=token, _external=True)
+            mail_queue.dispatcher.enqueue(
+                email,
+                "Blogger101 Login Confirmation",
+                f"Go to {confirm_link} to login to your account",
+                f"<a href='{confirm_link}'>Login to Your Account<a>",
+            )
+            return render_template("verify_login.html", login_status=None)
+        auth.log_in(session, login_response["user"])
+        flash("Successfully Logged In")
+        return redirect("/")
 
 
 @bp.route("/logout")
@@ -428,21 +497,216 @@ def logout():
 @bp.route("/api/v1/blogs")
 def api_blogs():
     relative = request.args.get("relative", False)
-    output = []
-    for blog in sorted(
-        list(mongo.db.blogs.find({})),
-        key=lambda date: datetime.datetime.strptime(
-            date["date_released"] + date["time_released"], "%m/%d/20%y%H:%M:%S:%f"
-        ),
-        reverse=True,
-    ):
-        blog["_id"] = str(blog["_id"])
-        if not relative:
-            blog["link"] = urllib.parse.urljoin(
-                "https://blogger-101.herokuapp.com", blog["link"]
+    limit = request.args.get("limit")
+    after = request.args.get("after")
+
+    try:
+        fields = listing.parse_fields(request.args.get("fields"))
+    except listing.InvalidFields:
+        return {"success": False, "message": "Invalid fields"}, status.BAD_REQUEST
+
+    count, modified_at = listing.latest_change(mongo.db.blogs, mongo.db.blog_tombstones)
+    etag = http_caching.make_etag(count, modified_at, request.query_string)
+
+    if limit is None and after is None:
+        # The full dump is streamed, as a JSON array unless ?stream=ndjson
+        ndjson = request.args.get("stream") == "ndjson"
+
+        def export():
+            cursor = (
+                mongo.db.blogs.find({}, fields or listing.EXPORT_FIELDS)
+                .sort(listing.NEWEST_FIRST)
+                .batch_size(listing.EXPORT_BATCH_SIZE)
+            )
+            return Response(
+                stream_with_context(listing.export_chunks(cursor, relative, ndjson)),
+                mimetype="application/x-ndjson" if ndjson else "application/json",
             )
-        output.append(blog)
-    return jsonify(output)
+
+        return http_caching.conditional_response(etag, modified_at, export)
+
+    try:
+        limit = listing.parse_limit(limit)
+        if after:
+            listing.decode_cursor(after)
+    except ValueError:
+        return {
+            "success": False,
+            "message": "Invalid limit or cursor",
+        }, status.BAD_REQUEST
+
+    def render():
+        page, next_cursor = listing.find_page(
+            mongo.db.blogs, {}, limit, after, fields or listing.SUMMARY_FIELDS
+        )
+        return {
+            "blogs": [listing.to_json(blog, relative) for blog in page],
+            "next": next_cursor,
+        }
+
+    return http_caching.conditional_response(etag, modified_at, render)
+
+
+@bp.route("/api/v1/user-blogs/<user>")
+def user_blogs_api(user):
+    relative = request.args.get("relative", False)
+    try:
+        page, next_cursor = listing.find_page(
+            mongo.db.blogs,
+            {"user": user},
+            listing.parse_limit(request.args.get("limit")),
+            request.args.get("after"),
+            listing.parse_fields(request.args.get("fields"), listing.SUMMARY_FIELDS),
+        )
+    except listing.InvalidFields:
+        return {"success": False, "message": "Invalid fields"}, status.BAD_REQUEST
+    except ValueError:
+        return {
+            "success": False,
+            "message": "Invalid limit or cursor",
+        }, status.BAD_REQUEST
+    return {
+        "blogs": [listing.to_json(blog, relative) for blog in page],
+        "next": next_cursor,
+    }
+
+
+@bp.route("/api/v1/tags")
+def tags_api():
+    try:
+        limit = listing.parse_limit(request.args.get("limit"))
+    except ValueError:
+        return {"success": False, "message": "Invalid limit"}, status.BAD_REQUEST
+    return {
+        "tags": [
+            {"tag": tag["_id"], "count": tag["count"]} for tag in tags.most_used(limit)
+        ]
+    }
+
+
+@bp.route("/api/v1/tags/<tag>")
+def tag_blogs(tag):
+    relative = request.args.get("relative", False)
+    try:
+        page, next_cursor = listing.find_page(
+            mongo.db.blogs,
+            {"tags": tag.lower()},
+            listing.parse_limit(request.args.get("limit")),
+            request.args.get("after"),
+            listing.parse_fields(request.args.get("fields"), listing.SUMMARY_FIELDS),
+        )
+    except listing.InvalidFields:
+        return {"success": False, "message": "Invalid fields"}, status.BAD_REQUEST
+    except ValueError:
+        return {
+            "success": False,
+            "message": "Invalid limit or cursor",
+        }, status.BAD_REQUEST
+    return {
+        "blogs": [listing.to_json(blog, relative) for blog in page],
+        "next": next_cursor,
+    }
+
+
+@bp.route("/api/v1/trending")
+def trending_api():
+    relative = request.args.get("relative", False)
+    try:
+        limit = listing.parse_limit(request.args.get("limit"))
+    except ValueError:
+        return {"success": False, "message": "Invalid limit"}, status.BAD_REQUEST
+    return {
+        "blogs": [
+            listing.to_json(blog, relative) for blog in view_counts.trending(limit)
+        ]
+    }
+
+
+def _search(limit):
+    return search.search(
+        request.args.get("q", "").strip(),
+        limit,
+        request.args.get("after"),
+        bool(request.args.get("recent")),
+        int(current_app.config.get("SEARCH_MAX_TIME_MS") or search.DEFAULT_MAX_TIME_MS),
+    )
+
+
+@bp.route("/search")
+def search_page():
+    query = request.args.get("q", "").strip()
+    results, next_cursor, timed_out = [], None, False
+    if query:
+        try:
+            results, next_cursor = _search(listing.DEFAULT_PAGE_SIZE)
+        except listing.InvalidCursor:
+            abort(400)
+        except ExecutionTimeout:
+            timed_out = True
+    return render_template(
+        "search.html",
+        query=query,
+        recent=bool(request.args.get("recent")),
+        results=results,
+        next_cursor=next_cursor,
+        timed_out=timed_out,
+        login_status=session["logged_in"] if auth.logged_in(session) else None,
+    )
+
+
+@bp.route("/api/v1/search")
+def search_api():
+    if not request.args.get("q", "").strip():
+        return {"success": False, "message": "Missing query"}, status.BAD_REQUEST
+    relative = request.args.get("relative", False)
+    try:
+        results, next_cursor = _search(listing.parse_limit(request.args.get("limit")))
+    except ValueError:
+        return {
+            "success": False,
+            "message": "Invalid limit or cursor",
+        }, status.BAD_REQUEST
+    except ExecutionTimeout:
+        return {
+            "success": False,
+            "message": "The search took too long",
+        }, status.SERVICE_UNAVAILABLE
+    return {
+        "results": [listing.to_json(blog, relative) for blog in results],
+        "next": next_cursor,
+    }
+
+
+@bp.route("/api/v1/changes")
+def blog_changes():
+    relative = request.args.get("relative", False)
+    try:
+        written, deleted, next_token, more = changes.find_changes(
+            request.args.get("since"),
+            listing.parse_limit(request.args.get("limit"), listing.MAX_PAGE_SIZE),
+            float(
+                current_app.config.get(
+                    "CHANGES_SETTLE_SECONDS", changes.DEFAULT_SETTLE_SECONDS
+                )
+            ),
+        )
+    except changes.ExpiredToken:
+        return {
+            "success": False,
+            "message": "Too old to sync, download every blog again",
+            "resync": True,
+        }, status.GONE
+    except ValueError:
+        return {
+            "success": False,
+            "message": "Invalid limit or token",
+        }, status.BAD_REQUEST
+    return {
+        "blogs": [listing.to_json(blog, relative) for blog in written],
+        "deleted": [str(_id) for _id in deleted],
+        "next": next_token,
+        "more": more,
+    }
 
 
 @bp.route("/api/v1/post-blog", methods=["POST"])
@@ -450,26 +714,69 @@ def post_blog_api():
     title = request.form.get("title")
     user = request.form.get("user")
     blog_content = request.form.get("blog_content")
+    try:
+        blog_tags = tags.parse(request.form.get("tags"))
+    except tags.InvalidTags:
+        return {"success": False, "message": "Invalid Tags"}, status.BAD_REQUEST
+    image = request.files.get("file")
+    if image is None or not image.filename:
+        return {"success": False, "message": "Missing Blog Image"}, status.BAD_REQUEST
+    image_path = image_uploads.uploader.spool(image)
     name = title.replace(" ", "_").lower()
-    to_upload_image = current_app.config["ImgurObject"]._send_request(
-        "https://api.imgur.com/3/image",
-        method="POST",
-        params={"image": base64.b64encode(request.files["file"].read())},
-    )
+    released_at = datetime.datetime.utcnow()
     doc = {
         "title": title,
         "user": user,
         "name": f"{name}.html",
         "text": blog_content,
+        **markdown_render.rendered_fields(blog_content),
         "link": f"/blog/{name}",
-        "date_released": datetime.datetime.utcnow().strftime("%m/%d/%Y"),
-        "time_released": datetime.datetime.utcnow().strftime("%H:%M:%S:%f"),
+        "date_released": released_at.strftime("%m/%d/%Y"),
+        "time_released": released_at.strftime("%H:%M:%S:%f"),
+        "released_at": released_at,
+        "updated_at": released_at,
         "comments": [],
-        "image": to_upload_image["link"],
+        "comment_count": 0,
+        "tags": blog_tags,
+        "image": "",
+        "image_status": image_uploads.PENDING,
     }
 
-    mongo.db.blogs.insert_one(doc)
-    return {"success": True}
+    try:
+        _id = mongo.db.blogs.insert_one(doc).inserted_id
+    except DuplicateKeyError:
+        os.remove(image_path)
+        return {"success": False, "message": "A Blog With That Title Already Exists"}
+    tags.update_counts(added=blog_tags)
+    cache.blog_listing.bump()
+    image_uploads.uploader.submit(_id, image_path)
+    return {"success": True, "id": str(_id)}
+
+
+@bp.route("/api/v1/blog-image-status/<blog_id>")
+def blog_image_status(blog_id):
+    if not ObjectId.is_valid(blog_id):
+        return {"found": False}, status.RESOURCE_NOT_FOUND
+    blog = mongo.db.blogs.find_one(
+        {"_id": ObjectId(blog_id)}, {"image": True, "image_status": True}
+    )
+    if blog is None:
+        return {"found": False}, status.RESOURCE_NOT_FOUND
+    return {
+        "found": True,
+        "status": blog.get("image_status", image_uploads.DONE),
+        "image": blog["image"],
+    }
+
+
+@bp.route("/assets/<path:filename>")
+def asset(filename):
+    return static_assets.assets.send(filename)
+
+
+@bp.route("/uploads/<filename>")
+def uploaded_image(filename):
+    return send_from_directory(current_app.config["IMAGE_UPLOAD_FOLDER"], filename)
 
 
 @bp.route("/api/v1/auth/check-user", methods=["POST"])
@@ -498,9 +805,7 @@ def add_user():
         "last_name": request.json.get("last_name"),
         "username": request.json.get("username"),
         "email": request.json.get("email"),
-        "password": flask_bcrypt.generate_password_hash(
-            request.json.get("password")
-        ).decode(),
+        "password": passwords.hasher.hash(request.json.get("password")),
     }
     email_already_exists = mongo.db.users.find_one({"email": doc["email"]}) is not None
     username_already_exists = (
@@ -516,7 +821,10 @@ def add_user():
             else "username",
         }
 
-    mongo.db.users.insert_one(doc)
+    try:
+        mongo.db.users.insert_one(doc)
+    except DuplicateKeyError:
+        return {"success": False, "already": "email or username"}
     return {"success": True, "already": None}
 
 
@@ -536,9 +844,8 @@ def add_user_v2():
         "last_name": request.json.get("last_name"),
         "username": request.json.get("username"),
         "email": request.json.get("email"),
-        "password": flask_bcrypt.generate_password_hash(
-            request.json.get("password")
-        ).decode(),
+        "password": passwords.hasher.hash(request.json.get("password")),
+        "created_at": datetime.datetime.utcnow(),
     }
     mobile_phone_uri = request.json.get("mobile_phone_uri")
 
@@ -571,15 +878,11 @@ def add_user_v2():
         else confirm_link_backup
     )
 
-    email_oauth.send_message(
-        current_app.config["GMAIL_API_Creds"],
-        email_oauth.create_message(
-            f"Blogger101 <{current_app.config['EMAIL_SENDER']}>",
-            doc["email"],
-            "Blogger101 Email Confirmation",
-            f"Go to {confirm_link} to verify your email",
-            f"<a href='{confirm_link}'>Verify Email<a>",
-        ),
+    mail_queue.dispatcher.enqueue(
+        doc["email"],
+        "Blogger101 Email Confirmation",
+        f"Go to {confirm_link} to verify your email",
+        f"<a href='{confirm_link}'>Verify Email<a>",
     )
 
     return {"success": True, "already": None, "email_verification_link": confirm_link}
@@ -593,7 +896,10 @@ def confirm_email_api():
     if unverified_user is not None:
         del unverified_user["_id"]
         mongo.db.unverified_users.delete_one(unverified_user)
-        mongo.db.users.insert_one(unverified_user)
+        try:
+            mongo.db.users.insert_one(unverified_user)
+        except DuplicateKeyError:
+            return {"success": False, "already": _already_registered(unverified_user)}
         del unverified_user["_id"]
         return {"success": True, "user": unverified_user}
     return {"success": False}, status.USER_NOT_FOUND
@@ -605,9 +911,9 @@ def change_password_email_api():
     mobile_phone_uri = request.json.get("mobile_phone_uri")
     user = mongo.db.users.find_one({"email": email})
     if user is not None:
-        token = serializer.dumps(email, "email-confirm")
+        token = password_resets.create(user["_id"])
         confirm_link_backup = url_for(
-            "routes.confirm_email", token=token, _external=True
+            "routes.change_password", token=token, _external=True
         )
         confirm_link = (
             url_for(
@@ -620,15 +926,11 @@ def change_password_email_api():
             else confirm_link_backup
         )
 
-        email_oauth.send_message(
-            current_app.config["GMAIL_API_Creds"],
-            email_oauth.create_message(
-                f"Blogger101 <{current_app.config['EMAIL_SENDER']}>",
-                email,
-                "Blogger101 Email Confirmation",
-                f"Go to {confirm_link} to verify your email",
-                f"<a href='{confirm_link}'>Verify Email<a>",
-            ),
+        mail_queue.dispatcher.enqueue(
+            email,
+            "Blogger101 Password Change Confirmation",
+            f"Go to {confirm_link} to change your password",
+            f"<a href='{confirm_link}'>Change Password<a>",
         )
         return {"success": True}
     return {"success": False}, status.USER_NOT_FOUND
@@ -637,17 +939,23 @@ def change_password_email_api():
 @bp.route("/api/v1/auth/change-password", methods=["POST"])
 def change_password_api():
     token = request.json.get("token")
-    new_password = flask_bcrypt.generate_password_hash(
-        request.json.get("new_password")
-    ).decode()
-    email = serializer.loads(token, salt="email-confirm", max_age=3600)
-    user = mongo.db.users.find_one({"email": email})
-    if user is not None:
-        del user["_id"]
-        mongo.db.users.update_one(
-            {"email": email}, {"$set": {"password": new_password, "user": user}}
-        )
-    return {"success": False}, status.USER_NOT_FOUND
+    new_password = request.json.get("new_password")
+    # Checked first, so that a bad request does not use up the token
+    if not isinstance(token, str) or not token:
+        return {"success": False, "message": "Missing token"}, status.BAD_REQUEST
+    if not isinstance(new_password, str) or not new_password:
+        return {
+            "success": False,
+            "message": "Missing new password",
+        }, status.BAD_REQUEST
+    user_id = password_resets.consume(token)
+    if user_id is None:
+        return {"success": False}, status.USER_NOT_FOUND
+    mongo.db.users.update_one(
+        {"_id": user_id},
+        {"$set": {"password": passwords.hasher.hash(new_password)}},
+    )
+    return {"success": True}
 
 
 @bp.route("/api/v1/add-comment", methods=["POST"])
@@ -655,72 +963,77 @@ def add_comment():
     blog = request.json["blog_title"]
     comment_type = request.json["type"]
     comment_content = f"&zwnj;{request.json['comment_content']}"
-    blog_found = mongo.db.blogs.find_one({"title": blog})
-    if blog_found is None:
-        return {"worked": False}
+    _id = str(
+        mongo.db.comments.insert_one(
+            {
+                "comment": comment_content,
+                "user": request.json["user"],
+                "html": markdown_render.render(comment_content),
+            }
+        ).inserted_id
+    )
 
     if comment_type == "main":
-        _id = str(
-            mongo.db.comments.insert_one(
-                {"comment": comment_content, "user": request.json["user"]}
-            ).inserted_id
+        result = mongo.db.blogs.update_one(
+            {"title": blog},
+            {
+                "$push": {"comments": [_id, []]},
+                "$inc": {"comment_count": 1},
+                "$set": {"updated_at": datetime.datetime.utcnow()},
+            },
         )
-        comments_tmp = blog_found["comments"]
-        comments_tmp.append([_id, []])
     else:
-        id_of_comment = request.json["id"]
-        if all(comment[0] != id_of_comment for comment in blog_found["comments"]):
-            return {"worked": False}
-        _id = str(
-            mongo.db.comments.insert_one(
-                {"comment": comment_content, "user": request.json["user"]}
-            ).inserted_id
+        # The $set and $inc modify the blog even when no thread matches the
+        # array filter, so the thread has to be part of the query
+        result = mongo.db.blogs.update_one(
+            {"title": blog, "comments": {"$elemMatch": {"0": request.json["id"]}}},
+            {
+                "$push": {"comments.$[thread].1": _id},
+                "$inc": {"comment_count": 1},
+                "$set": {"updated_at": datetime.datetime.utcnow()},
+            },
+            array_filters=[{"thread.0": request.json["id"]}],
         )
-        comments_tmp = blog_found["comments"]
-        for index, comment in enumerate(comments_tmp):
-            if comment[0] == request.json["id"]:
-                comments_tmp[index][1].append(_id)
-                break
-    mongo.db.blogs.update_one({"title": blog}, {"$set": {"comments": comments_tmp}})
+
+    if result.matched_count == 0:
+        mongo.db.comments.delete_one({"_id": ObjectId(_id)})
+        return {"worked": False}
     return {"worked": True}
 
 
 @bp.route("/api/v1/blog-comments/<blog_title>")
 def get_comments(blog_title):
-    blog = mongo.db.blogs.find_one({"title": blog_title})
+    blog = mongo.db.blogs.find_one(
+        {"title": blog_title},
+        {"comments": True, "updated_at": True, "released_at": True},
+    )
     if blog is None:
         return {"found": False}, status.RESOURCE_NOT_FOUND
-    comments = blog["comments"]
-    comment_tree = []
-    for comment in comments:
-        comment_data = mongo.db.comments.find_one({"_id": ObjectId(str(comment[0]))})
-        all_comments = {
-            "text": comment_data["comment"],
-            "user": comment_data["user"],
-            "id": str(comment_data["_id"]),
-            "sub_comments": [],
-        }
-        for sub_comment in comment[1]:
-            sub_comment_data = mongo.db.comments.find_one(
-                {"_id": ObjectId(str(sub_comment))}
-            )
-            all_comments["sub_comments"].append(
-                {
-                    "text": sub_comment_data["comment"],
-                    "user": sub_comment_data["user"],
-                    "id": str(sub_comment),
-                }
-            )
-        comment_tree.append(all_comments)
-    return jsonify(comment_tree)
+    limit = request.args.get("limit", type=int)
+    offset = request.args.get("offset", 0, type=int)
+    if (limit is not None and limit < 0) or offset < 0:
+        return {"found": True, "message": "Invalid limit or offset"}, status.BAD_REQUEST
+    # Comments cannot be edited, so the thread ids pin down the whole tree
+    response = http_caching.conditional_response(
+        http_caching.make_etag(blog["comments"], limit, offset),
+        http_caching.last_modified(blog),
+        lambda: jsonify(comments.load_comment_tree(blog["comments"], limit, offset)),
+    )
+    response.headers["X-Total-Count"] = len(blog["comments"])
+    return response
 
 
 @bp.route("/api/v1/delete-blog")
 def delete_blog_api():
     title = request.args.get("title")
     user = request.args.get("user")
-    if mongo.db.blogs.find_one({"title": title, "user": user}) is not None:
-        mongo.db.blogs.delete_one({"title": title, "user": user})
+    blog = mongo.db.blogs.find_one_and_delete(
+        {"title": title, "user": user}, {"_id": True, "tags": True}
+    )
+    if blog is not None:
+        changes.record_deletion(blog["_id"])
+        tags.update_counts(removed=blog.get("tags", []))
+        cache.blog_listing.bump()
         return {"success": True}
     return {"success": False, "message": "The Blog Was Not Found"}
 
@@ -732,14 +1045,42 @@ def update_blog():
     user = request.json.get("user")
     blog_content = request.json.get("blog_content")
     name = title.replace(" ", "_").lower()
-    mongo.db.blogs.update_one(
-        {"title": old_title, "user": user},
-        {"$set": {"title": title, "text": blog_content, "name": f"{name}.html"}},
-    )
+    fields = {
+        "title": title,
+        "text": blog_content,
+        "name": f"{name}.html",
+        **markdown_render.rendered_fields(blog_content),
+        "updated_at": datetime.datetime.utcnow(),
+    }
+    # Leaving out tags keeps the ones the blog has
+    if "tags" in request.json:
+        try:
+            fields["tags"] = tags.parse(request.json["tags"])
+        except tags.InvalidTags:
+            return {"success": False, "message": "Invalid Tags"}, status.BAD_REQUEST
+    try:
+        # The tags before the update tell which counts change
+        blog = mongo.db.blogs.find_one_and_update(
+            {"title": old_title, "user": user}, {"$set": fields}, {"tags": True}
+        )
+    except DuplicateKeyError:
+        return {"success": False, "message": "A Blog With That Title Already Exists"}
+    if blog is not None and "tags" in fields:
+        tags.update_counts(fields["tags"], blog.get("tags", []))
+    cache.blog_listing.bump()
 
     return {"success": True}
 
 
+@bp.errorhandler(RequestEntityTooLarge)
+def request_too_large(error):
+    max_megabytes = current_app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    return {
+        "success": False,
+        "message": f"Uploads Are Limited to {max_megabytes} MB",
+    }, status.REQUEST_TOO_LARGE
+
+
 @bp.errorhandler(HTTPException)
 def error_handling(error):
     flash("Page Not Found")
@@ -754,14 +1095,11 @@ def error_handling(error):
 @bp.context_processor
 def get_blogs():
     def find_blogs():
-        return reversed(
-            sorted(
-                list(mongo.db.blogs.find()),
-                key=lambda date: datetime.datetime.strptime(
-                    date["date_released"] + date["time_released"],
-                    "%m/%d/20%y%H:%M:%S:%f",
-                ),
-            )
+        return cache.blog_listing.get_or_set(
+            "all",
+            lambda: list(
+                mongo.db.blogs.find({}, listing.CARD_FIELDS).sort(listing.NEWEST_FIRST)
+            ),
         )
 
     return dict(find_blogs=find_blogs)
@@ -0,0 +1,144 @@
+import datetime
+import re
+
+from bson.objectid import ObjectId
+from markupsafe import Markup, escape
+
+from blogger101.app_extensions import mongo
+from blogger101 import listing
+from blogger101 import markdown_render
+
+# A title match counts as much as ten matches in the body
+WEIGHTS = {"title": 10, "text": 1}
+
+# With ?recent=1 a blog this many days old ranks at half its text score
+RECENCY_HALF_LIFE_DAYS = 30
+
+DEFAULT_MAX_TIME_MS = 1000
+
+SNIPPET_LENGTH = 160
+
+RESULT_FIELDS = {
+    "title": True,
+    "user": True,
+    "link": True,
+    "date_released": True,
+    "released_at": True,
+    "image": True,
+    "image_card": True,
+    "excerpt": True,
+    # Snippets are cut from the rendered text, which is dropped afterwards
+    "html": True,
+}
+
+# Blogs without released_at rank as the oldest when recency counts
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def terms(query: str) -> list:
+    """The words of ``query`` that results are expected to contain, leaving
+    out the ones excluded with ``-``."""
+    return [
+        word
+        for token in query.split()
+        if not token.startswith("-")
+        for word in re.findall(r"\w+", token.lower())
+    ]
+
+
+def snippet(plain: str, words: list, length=SNIPPET_LENGTH) -> Markup:
+    """Cut ``length`` characters of ``plain`` around the first query word
+    and wrap the words in ``<mark>``. Everything else is escaped.
+
+    The text index stems words, so a word is highlighted wherever a word
+    starts with it.
+    """
+    pattern = (
+        re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + r")\w*", re.I)
+        if words
+        else None
+    )
+    match = pattern.search(plain) if pattern else None
+    start = 0 if match is None else max(0, match.start() - length // 3)
+    if start:
+        # Start and end at word boundaries
+        start = plain.rfind(" ", 0, start) + 1
+    end = start + length
+    if end < len(plain):
+        space = plain.rfind(" ", start, end)
+        end = space if space > start else end
+    else:
+        end = len(plain)
+
+    window = plain[start:end]
+    parts = [Markup("…") if start else Markup("")]
+    position = 0
+    for found in pattern.finditer(window) if pattern else ():
+        parts.append(escape(window[position : found.start()]))
+        parts.append(Markup("<mark>%s</mark>") % found.group())
+        position = found.end()
+    parts.append(escape(window[position:]))
+    if end < len(plain):
+        parts.append(Markup("…"))
+    return Markup("").join(parts)
+
+
+def _rank(now: datetime.datetime, recent: bool):
+    if not recent:
+        return "$score"
+    age = {"$subtract": [now, {"$ifNull": ["$released_at", _EPOCH]}]}
+    half_life = RECENCY_HALF_LIFE_DAYS * 24 * 60 * 60 * 1000
+    return {"$divide": ["$score", {"$add": [1, {"$divide": [age, half_life]}]}]}
+
+
+def search(query: str, limit: int, after=None, recent=False, max_time_ms=None):
+    """Return one page of the blogs matching ``query``, best first, and the
+    cursor of the next page.
+
+    The cursor pins the time recency was measured at, so the ranks of later
+    pages are computed the same way. Raises listing.InvalidCursor for a
+    cursor that was not made here.
+    """
+    if after:
+        try:
+            rank, _id, at = listing.decode_token(after)
+            now = datetime.datetime.fromisoformat(at)
+            after_filter = {
+                "$or": [
+                    {"rank": {"$lt": rank}},
+                    {"rank": rank, "_id": {"$lt": ObjectId(_id)}},
+                ]
+            }
+        except Exception as error:
+            raise listing.InvalidCursor(after) from error
+    else:
+        now = datetime.datetime.utcnow()
+        after_filter = None
+
+    pipeline = [
+        {"$match": {"$text": {"$search": query}}},
+        {"$project": {**RESULT_FIELDS, "score": {"$meta": "textScore"}}},
+        {"$addFields": {"rank": _rank(now, recent)}},
+    ]
+    if after_filter:
+        pipeline.append({"$match": after_filter})
+    pipeline += [{"$sort": {"rank": -1, "_id": -1}}, {"$limit": limit + 1}]
+
+    blogs = list(
+        mongo.db.blogs.aggregate(pipeline, maxTimeMS=max_time_ms or DEFAULT_MAX_TIME_MS)
+    )
+    next_cursor = (
+        listing.encode_token(
+            [blogs[limit - 1]["rank"], str(blogs[limit - 1]["_id"]), now.isoformat()]
+        )
+        if len(blogs) > limit
+        else None
+    )
+
+    words = terms(query)
+    results = blogs[:limit]
+    for blog in results:
+        blog["snippet"] = snippet(
+            markdown_render.plain_text(blog.pop("html", "")), words
+        )
+    return results, next_cursor
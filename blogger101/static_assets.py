@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+
+import brotli
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+# Only text compresses well; images are fingerprinted but served as they are
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt"}
+
+# Tried in order of preference when the browser accepts both
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# A fingerprinted file never changes, so browsers need not even revalidate it
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={365 * 24 * 60 * 60}, immutable"
+
+MANIFEST = "manifest.json"
+
+assets_cli = AppGroup("assets", help="Static asset commands.")
+
+
+def fingerprinted_name(path: str, data: bytes) -> str:
+    """``materialize/materialize.min.js`` -> ``materialize/materialize.min.<hash>.js``"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def _write_atomically(path: str, data: bytes):
+    # Every gunicorn worker builds on startup, so they can race on a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+def build(static_folder: str, output_folder: str) -> dict:
+    """Copy every file in ``static_folder`` to a content-hashed name in
+    ``output_folder``, next to Brotli and gzip compressed copies of the
+    text files. Returns and writes the manifest mapping each original path
+    to its fingerprinted one.
+
+    Files whose fingerprinted copy already exists are not compressed again,
+    so rebuilding an unchanged tree is cheap.
+    """
+    manifest = {}
+    for directory, _, filenames in os.walk(static_folder):
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            path = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            with open(source, "rb") as file:
+                data = file.read()
+            manifest[path] = fingerprinted_name(path, data)
+
+            target = os.path.join(output_folder, manifest[path])
+            if os.path.exists(target):
+                continue
+            if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+                _write_atomically(target + ".br", brotli.compress(data, quality=11))
+                _write_atomically(target + ".gz", gzip.compress(data, 9, mtime=0))
+            _write_atomically(target, data)
+
+    _write_atomically(
+        os.path.join(output_folder, MANIFEST),
+        json.dumps(manifest, indent=2, sort_keys=True).encode(),
+    )
+    return manifest
+
+
+class StaticAssets:
+    """Serves fingerprinted copies of the static files under ``/assets/``.
+
+    A fingerprinted URL changes whenever the file does, so responses can be
+    cached forever, and the compressed copies built ahead of time spare
+    compressing the file on every request.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.manifest = {}
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault(
+            "ASSETS_FOLDER", os.path.join(app.instance_path, "assets")
+        )
+        app.config.setdefault("ASSETS_BUILD_ON_STARTUP", True)
+        if str(app.config["ASSETS_BUILD_ON_STARTUP"]).lower() in ("1", "true"):
+            self.manifest = build(app.static_folder, app.config["ASSETS_FOLDER"])
+        else:
+            self.manifest = self.load_manifest()
+        app.add_template_global(self.url, "static_url")
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.app.config["ASSETS_FOLDER"], MANIFEST)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def url(self, path: str) -> str:
+        """The fingerprinted URL of a static file, or its plain ``/static/``
+        URL when it was not built."""
+        if path in self.manifest:
+            return url_for("routes.asset", filename=self.manifest[path])
+        return url_for("static", filename=path)
+
+    def send(self, filename: str):
+        folder = self.app.config["ASSETS_FOLDER"]
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        for encoding, suffix in ENCODINGS:
+            compressed = safe_join(folder, filename + suffix)
+            if (
+                request.accept_encodings[encoding]
+                and compressed
+                and os.path.isfile(compressed)
+            ):
+                response = send_from_directory(
+                    folder, filename + suffix, mimetype=mimetype
+                )
+                response.headers["Content-Encoding"] = encoding
+                break
+        else:
+            response = send_from_directory(folder, filename, mimetype=mimetype)
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+assets = StaticAssets()
+
+
+@assets_cli.command("build")
+def build_command():
+    manifest = build(current_app.static_folder, current_app.config["ASSETS_FOLDER"])
+    for path, fingerprinted in sorted(manifest.items()):
+        click.echo(f"{path} -> {fingerprinted}")
@@ -0,0 +1,91 @@
+import re
+
+from pymongo import ASCENDING, DESCENDING, DeleteMany, UpdateOne
+
+from blogger101.app_extensions import mongo
+
+MAX_TAGS = 10
+MAX_TAG_LENGTH = 32
+
+TAG_PATTERN = re.compile(r"[a-z0-9][a-z0-9-]*")
+
+MOST_USED_FIRST = [("count", DESCENDING), ("_id", ASCENDING)]
+
+
+class InvalidTags(ValueError):
+    pass
+
+
+def parse(value) -> list:
+    """Normalise the tags of a blog, given as a list or a comma separated
+    string, to lowercase without duplicates.
+
+    Raises InvalidTags for more than MAX_TAGS tags or a tag that is not
+    letters, digits and dashes.
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        raise InvalidTags(value)
+    tags = []
+    for tag in value:
+        if not isinstance(tag, str):
+            raise InvalidTags(value)
+        tag = tag.strip().lower()
+        if not tag or tag in tags:
+            continue
+        if len(tag) > MAX_TAG_LENGTH or not TAG_PATTERN.fullmatch(tag):
+            raise InvalidTags(value)
+        tags.append(tag)
+    if len(tags) > MAX_TAGS:
+        raise InvalidTags(value)
+    return tags
+
+
+def update_counts(added=(), removed=()):
+    """Apply the tags a write added to and removed from one blog to the
+    per-tag blog counts in ``tag_counts``.
+
+    Counts are kept up to date here rather than aggregated over the blogs
+    when they are read. Tags no blog uses any more are dropped.
+    """
+    added, removed = set(added), set(removed)
+    operations = [
+        UpdateOne({"_id": tag}, {"$inc": {"count": 1}}, upsert=True)
+        for tag in sorted(added - removed)
+    ] + [
+        UpdateOne({"_id": tag}, {"$inc": {"count": -1}})
+        for tag in sorted(removed - added)
+    ]
+    if not operations:
+        return
+    if removed - added:
+        operations.append(DeleteMany({"count": {"$lte": 0}}))
+    mongo.db.tag_counts.bulk_write(operations)
+
+
+def most_used(limit: int) -> list:
+    return list(mongo.db.tag_counts.find().sort(MOST_USED_FIRST).limit(limit))
+
+
+def rebuild_counts() -> int:
+    """Recount ``tag_counts`` from the blogs, for older blogs and after a
+    write that failed between the blog and its counts. Returns the number of
+    tags in use."""
+    counted = {
+        group["_id"]: group["count"]
+        for group in mongo.db.blogs.aggregate(
+            [
+                {"$unwind": "$tags"},
+                {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            ]
+        )
+    }
+    operations = [
+        UpdateOne({"_id": tag}, {"$set": {"count": count}}, upsert=True)
+        for tag, count in counted.items()
+    ] + [DeleteMany({"_id": {"$nin": list(counted)}})]
+    mongo.db.tag_counts.bulk_write(operations)
+    return len(counted)
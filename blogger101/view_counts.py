@@ -0,0 +1,264 @@
+import atexit
+import collections
+import datetime
+import threading
+
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+
+from blogger101.app_extensions import mongo
+
+# Views are kept per blog and hour for this long, and trending scores are
+# computed from them
+VIEW_HISTORY = datetime.timedelta(days=7)
+
+HIGHEST_SCORE_FIRST = [("score", DESCENDING), ("_id", DESCENDING)]
+
+# What /api/v1/trending returns of each blog, copied into ``trending`` so
+# that a request reads nothing else
+TRENDING_FIELDS = {
+    "title": True,
+    "user": True,
+    "link": True,
+    "date_released": True,
+    "released_at": True,
+    "image": True,
+    "image_card": True,
+    "excerpt": True,
+    "views": True,
+}
+
+
+def _hour(when: datetime.datetime) -> datetime.datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def _write_counts(collection, counts, operation) -> collections.Counter:
+    """Write each of ``counts`` with ``operation(key, count)`` in one bulk
+    write and return the counts that were not written."""
+    if not counts:
+        return collections.Counter()
+    keys = list(counts)
+    try:
+        collection.bulk_write(
+            [operation(key, counts[key]) for key in keys], ordered=False
+        )
+    except BulkWriteError as error:
+        # An unordered bulk write applies every operation but the failed ones
+        return collections.Counter(
+            {
+                keys[failure["index"]]: counts[keys[failure["index"]]]
+                for failure in error.details["writeErrors"]
+            }
+        )
+    except PyMongoError:
+        return counts
+    return collections.Counter()
+
+
+def compute_trending(half_life_hours: float, size: int) -> int:
+    """Score blogs by their views over VIEW_HISTORY, each view counting half
+    as much for every ``half_life_hours`` since it happened, and store the
+    ``size`` highest in the ``trending`` collection.
+
+    Returns the number of blogs stored.
+    """
+    now = datetime.datetime.utcnow()
+    age_in_half_lives = {
+        "$divide": [{"$subtract": [now, "$hour"]}, half_life_hours * 60 * 60 * 1000]
+    }
+    scores = {
+        group["_id"]: group["score"]
+        for group in mongo.db.blog_view_hours.aggregate(
+            [
+                {"$match": {"hour": {"$gte": now - VIEW_HISTORY}}},
+                {
+                    "$group": {
+                        "_id": "$blog",
+                        "score": {
+                            "$sum": {
+                                "$multiply": [
+                                    "$views",
+                                    {"$pow": [0.5, age_in_half_lives]},
+                                ]
+                            }
+                        },
+                    }
+                },
+                {"$sort": {"score": -1}},
+                {"$limit": size},
+            ]
+        )
+    }
+    # Deleted blogs drop out here
+    blogs = list(mongo.db.blogs.find({"_id": {"$in": list(scores)}}, TRENDING_FIELDS))
+    if blogs:
+        mongo.db.trending.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": blog["_id"]},
+                    {
+                        "$set": {
+                            **blog,
+                            "score": scores[blog["_id"]],
+                            "computed_at": now,
+                        }
+                    },
+                    upsert=True,
+                )
+                for blog in blogs
+            ],
+            ordered=False,
+        )
+    mongo.db.trending.delete_many({"_id": {"$nin": [blog["_id"] for blog in blogs]}})
+    return len(blogs)
+
+
+def trending(limit: int) -> list:
+    return list(
+        mongo.db.trending.find({}, {"computed_at": False})
+        .sort(HIGHEST_SCORE_FIRST)
+        .limit(limit)
+    )
+
+
+def claim_run(name: str, interval: float) -> bool:
+    """Whether this worker gets to run the job ``name``, which is due every
+    ``interval`` seconds across all workers."""
+    now = datetime.datetime.utcnow()
+    try:
+        # When the job is not due the filter misses, and the upsert then
+        # collides with the existing lease
+        mongo.db.job_leases.find_one_and_update(
+            {"_id": name, "due_at": {"$lte": now}},
+            {"$set": {"due_at": now + datetime.timedelta(seconds=interval)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+class ViewCounter:
+    """Counts blog page views in memory and writes them in batches.
+
+    ``record`` only increments a counter. The buffered views are written with
+    one bulk ``$inc`` every ``VIEW_FLUSH_INTERVAL`` seconds, or as soon as
+    ``VIEW_FLUSH_THRESHOLD`` views are waiting, and once more when the worker
+    exits. The same background thread recomputes the trending blogs every
+    ``TRENDING_INTERVAL`` seconds, in one worker at a time.
+    """
+
+    def __init__(self):
+        self.app = None
+        # Views per blog, and per blog and hour for the trending scores.
+        # They are written separately, so either can be left over.
+        self._totals = collections.Counter()
+        self._hours = collections.Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        atexit.register(self.drain)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault("VIEW_COUNTER_THREAD", True)
+        app.config.setdefault("VIEW_FLUSH_INTERVAL", 10)
+        app.config.setdefault("VIEW_FLUSH_THRESHOLD", 1000)
+        app.config.setdefault("TRENDING_INTERVAL", 300)
+        app.config.setdefault("TRENDING_HALF_LIFE_HOURS", 24)
+        app.config.setdefault("TRENDING_SIZE", 100)
+
+    def record(self, blog_id):
+        hour = _hour(datetime.datetime.utcnow())
+        with self._lock:
+            self._totals[blog_id] += 1
+            self._hours[blog_id, hour] += 1
+            full = sum(self._totals.values()) >= int(
+                self.app.config["VIEW_FLUSH_THRESHOLD"]
+            )
+        if self.app.config["VIEW_COUNTER_THREAD"]:
+            self.start()
+            if full:
+                self._wake.set()
+        elif full:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._totals.values())
+
+    def flush(self) -> int:
+        """Write the buffered views and return how many blog views were
+        written.
+
+        Counts whose write fails go back into the buffer for the next flush.
+        """
+        with self._lock:
+            totals, self._totals = self._totals, collections.Counter()
+            hours, self._hours = self._hours, collections.Counter()
+        unwritten_totals = _write_counts(
+            mongo.db.blogs,
+            totals,
+            lambda blog_id, count: UpdateOne(
+                {"_id": blog_id}, {"$inc": {"views": count}}
+            ),
+        )
+        unwritten_hours = _write_counts(
+            mongo.db.blog_view_hours,
+            hours,
+            lambda key, count: UpdateOne(
+                {"blog": key[0], "hour": key[1]},
+                {"$inc": {"views": count}},
+                upsert=True,
+            ),
+        )
+        if unwritten_totals or unwritten_hours:
+            with self._lock:
+                self._totals.update(unwritten_totals)
+                self._hours.update(unwritten_hours)
+            self.app.logger.warning(
+                "Writing %d blog views failed, retrying on the next flush",
+                sum(unwritten_totals.values()) or sum(unwritten_hours.values()),
+            )
+        return sum(totals.values()) - sum(unwritten_totals.values())
+
+    def drain(self):
+        """Flush what is left, for when the worker shuts down."""
+        if self.app is None:
+            return
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception("Writing the buffered blog views failed")
+
+    def update_trending(self) -> bool:
+        """Recompute the trending blogs unless another worker did recently."""
+        if not claim_run("trending", float(self.app.config["TRENDING_INTERVAL"])):
+            return False
+        compute_trending(
+            float(self.app.config["TRENDING_HALF_LIFE_HOURS"]),
+            int(self.app.config["TRENDING_SIZE"]),
+        )
+        return True
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="view-counter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(float(self.app.config["VIEW_FLUSH_INTERVAL"]))
+            self._wake.clear()
+            try:
+                self.flush()
+                self.update_trending()
+            except Exception:
+                self.app.logger.exception("The view counter failed")
+
+
+counter = ViewCounter()
@@ -7,7 +7,15 @@ from dotenv import dotenv_values
 parent_dir = os.path.abspath(os.path.join(__file__, "../../"))
 sys.path.append(parent_dir)
 
-from blogger101 import create_app, app_extensions
+from blogger101 import (
+    create_app,
+    app_extensions,
+    db,
+    mail_queue,
+    passwords,
+    recaptcha,
+    view_counts,
+)
 
 
 if "DYNO" not in os.environ and "GITHUB_ACTIONS" not in os.environ:
@@ -17,11 +25,24 @@ else:
 
 
 @pytest.fixture()
-def app():
-    app = create_app()
-    app.config.update({"TESTING": True, "MONGO_URI": MONGO_URI_TESTING})
+def app(tmp_path):
+    # The mail dispatcher starts in create_app unless it is told not to
+    app = create_app({"MAIL_DISPATCHER_THREAD": False})
+    app.config.update(
+        {
+            "TESTING": True,
+            "MONGO_URI": MONGO_URI_TESTING,
+            "MAIL_TRANSPORT": "stub",
+            "MAIL_DISPATCHER_THREAD": False,
+            "VIEW_COUNTER_THREAD": False,
+            "RECAPTCHA_VERIFIER": "fake",
+            "IMAGE_STORE": "local",
+            "IMAGE_UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        }
+    )
 
     app_extensions.mongo.init_app(app)
+    db.ensure_indexes()
 
     app_extensions.mongo.db.users.insert_one(
         {
@@ -29,9 +50,7 @@ def app():
             "last_name": "Smoe",
             "username": "JoeSmoe",
             "email": "joe@smoe.com",
-            "password": app_extensions.flask_bcrypt.generate_password_hash(
-                "Password123"
-            ).decode(),
+            "password": passwords.hasher.hash("Password123"),
         }
     )
     app_extensions.mongo.db.blogs.insert_one(
@@ -47,6 +66,7 @@ def app():
             "time_released": datetime.datetime.now(datetime.timezone.utc).strftime(
                 "%H:%M:%S:%f"
             ),
+            "released_at": datetime.datetime.utcnow(),
             "comments": [],
             "image": "",
         },
@@ -55,10 +75,22 @@ def app():
     with app.app_context():
         yield app
 
+    view_counts.counter.flush()
     app_extensions.mongo.db.users.delete_many({})
     app_extensions.mongo.db.unverified_users.delete_many({})
     app_extensions.mongo.db.blogs.delete_many({})
+    app_extensions.mongo.db.blog_tombstones.delete_many({})
+    app_extensions.mongo.db.tag_counts.delete_many({})
+    app_extensions.mongo.db.blog_view_hours.delete_many({})
+    app_extensions.mongo.db.trending.delete_many({})
+    app_extensions.mongo.db.job_leases.delete_many({})
     app_extensions.mongo.db.comments.delete_many({})
+    app_extensions.mongo.db.cache_versions.delete_many({})
+    app_extensions.mongo.db.outbound_mail.delete_many({})
+    app_extensions.mongo.db.password_resets.delete_many({})
+    mail_queue.dispatcher.stub_transport.outbox.clear()
+    recaptcha.scorer.fake_verifier.next_score = 1.0
+    recaptcha.scorer.fake_verifier.tokens.clear()
 
 
 @pytest.fixture
@@ -0,0 +1,49 @@
+import datetime
+
+from google.oauth2.credentials import Credentials
+
+from blogger101 import email_oauth, mail_queue
+
+
+class FakeCredentials:
+    def __init__(self, expiry, refresh_token="refresh"):
+        self.expiry = expiry
+        self.refresh_token = refresh_token
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+
+def test_credentials_refreshed_ahead_of_expiry() -> None:
+    credentials = FakeCredentials(
+        datetime.datetime.utcnow() + datetime.timedelta(seconds=60)
+    )
+    holder = email_oauth.CredentialHolder(credentials, refresh_margin=300)
+    assert holder.refresh_if_needed() is True
+    assert holder.refresh_if_needed() is False
+    assert credentials.refreshes == 1
+
+
+def test_credentials_without_refresh_token_are_left_alone() -> None:
+    credentials = FakeCredentials(None, refresh_token=None)
+    holder = email_oauth.CredentialHolder(credentials)
+    assert holder.refresh_if_needed() is False
+
+
+def test_gmail_service_builds_without_network() -> None:
+    service = email_oauth.build_service(Credentials(token="token"))
+    assert hasattr(service, "users")
+
+
+def test_send_metrics_snapshot() -> None:
+    metrics = mail_queue.SendMetrics()
+    assert metrics.snapshot() == {"batches": 0, "messages": 0}
+    for milliseconds in range(1, 101):
+        metrics.record(milliseconds / 1000, 2)
+    snapshot = metrics.snapshot()
+    assert snapshot["batches"] == 100
+    assert snapshot["messages"] == 200
+    assert snapshot["max_ms"] == 100
+    assert 99 <= snapshot["p99_ms"] <= 100
@@ -1,4 +1,34 @@
+import datetime
+import gzip
+import io
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import brotli
+import pymongo.errors
+from flask import Flask
+from PIL import Image
+
+from blogger101 import (
+    app_extensions,
+    auth,
+    cache,
+    changes,
+    compression,
+    db,
+    image_uploads,
+    listing,
+    mail_queue,
+    markdown_render,
+    password_resets,
+    passwords,
+    recaptcha,
+    search,
+    static_assets,
+    tags,
+    view_counts,
+)
 
 
 def test_main_route_status_code(client) -> None:
@@ -154,6 +184,7 @@ def test_post_blog(client) -> None:
             },
             content_type="multipart/form-data",
         )
+    image_uploads.uploader.wait()
     response = client.get("/api/v1/blogs")
     response_json = json.loads(response.get_data(as_text=True))
     assert response.status_code == 200
@@ -168,3 +199,1299 @@ def test_post_blog(client) -> None:
     ]
     assert response_json[0]["comments"] == []
     assert response_json[0]["image"] != ""
+
+
+def test_blogs_api_cursor_pagination(client) -> None:
+    released_at = datetime.datetime(2022, 1, 1)
+    for index in range(5):
+        app_extensions.mongo.db.blogs.insert_one(
+            {
+                "title": f"Paginated Blog {index}",
+                "user": "JoeSmoe",
+                "name": f"paginated_blog_{index}.html",
+                "text": "",
+                "link": f"/blog/paginated_blog_{index}",
+                "date_released": released_at.strftime("%m/%d/%Y"),
+                "time_released": released_at.strftime("%H:%M:%S:%f"),
+                "released_at": released_at + datetime.timedelta(days=index % 3),
+                "comments": [],
+                "image": "",
+            }
+        )
+
+    titles = []
+    after = None
+    while True:
+        query = {"limit": 2} if after is None else {"limit": 2, "after": after}
+        response_json = client.get("/api/v1/blogs", query_string=query).get_json()
+        assert len(response_json["blogs"]) <= 2
+        titles += [blog["title"] for blog in response_json["blogs"]]
+        after = response_json["next"]
+        if after is None:
+            break
+
+    full_listing = client.get("/api/v1/blogs").get_json()
+    assert titles == [blog["title"] for blog in full_listing]
+    assert titles[0] == "Test Blog"
+    assert len(set(titles)) == 6
+
+
+def test_blogs_api_invalid_cursor(client) -> None:
+    response = client.get("/api/v1/blogs", query_string={"after": "not-a-cursor"})
+    assert response.status_code == 400
+    response = client.get("/api/v1/blogs", query_string={"limit": 0})
+    assert response.status_code == 400
+
+
+def test_backfill_released_at(app) -> None:
+    app_extensions.mongo.db.blogs.update_many({}, {"$unset": {"released_at": ""}})
+    assert db.backfill_released_at() == 1
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert isinstance(blog["released_at"], datetime.datetime)
+    assert db.backfill_released_at() == 0
+
+
+def test_blog_listing_cache_invalidated_by_writes(client) -> None:
+    assert b"Test Blog" in client.get("/").data
+
+    app_extensions.mongo.db.blogs.update_one(
+        {"title": "Test Blog"}, {"$set": {"title": "Renamed Behind The Cache"}}
+    )
+    assert b"Renamed Behind The Cache" not in client.get("/").data
+
+    client.get("/api/v1/delete-blog", query_string={"title": "Nope", "user": "x"})
+    assert b"Renamed Behind The Cache" not in client.get("/").data
+
+    client.post(
+        "/api/v1/update-blog",
+        json={
+            "title": "Updated Blog",
+            "old_title": "Renamed Behind The Cache",
+            "user": "JoeSmoe",
+            "blog_content": "new",
+        },
+    )
+    assert b"Updated Blog" in client.get("/").data
+
+
+def test_mongo_cache_version_is_shared(app) -> None:
+    first = cache.MongoVersion("test_listing", check_interval=0)
+    second = cache.MongoVersion("test_listing", check_interval=0)
+    before = second.get()
+    first.bump()
+    assert second.get() == before + 1
+
+
+def test_user_blogs_api(client) -> None:
+    app_extensions.mongo.db.blogs.insert_one(
+        {
+            "title": "Someone Else's Blog",
+            "user": "SomeoneElse",
+            "name": "someone_else's_blog.html",
+            "text": "not mine",
+            "link": "/blog/someone_else's_blog",
+            "released_at": datetime.datetime.utcnow(),
+            "comments": [],
+            "image": "",
+        }
+    )
+    response_json = client.get("/api/v1/user-blogs/JoeSmoe").get_json()
+    assert [blog["title"] for blog in response_json["blogs"]] == ["Test Blog"]
+    assert "text" not in response_json["blogs"][0]
+    assert "comments" not in response_json["blogs"][0]
+    assert response_json["next"] is None
+
+
+def test_myblogs_only_lists_own_blogs(client) -> None:
+    app_extensions.mongo.db.blogs.insert_one(
+        {
+            "title": "Someone Else's Blog",
+            "user": "SomeoneElse",
+            "name": "someone_else's_blog.html",
+            "text": "not mine",
+            "link": "/blog/someone_else's_blog",
+            "released_at": datetime.datetime.utcnow(),
+            "comments": [],
+            "image": "",
+        }
+    )
+    client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "Password123"},
+        content_type="multipart/form-data",
+    )
+    response = client.get("/myblogs")
+    assert response.status_code == 200
+    assert b"Test Blog" in response.data
+    assert b"Someone Else" not in response.data
+
+
+def test_blog_comments_tree(client) -> None:
+    for index in range(3):
+        client.post(
+            "/api/v1/add-comment",
+            json={
+                "blog_title": "Test Blog",
+                "type": "main",
+                "comment_content": f"comment {index}",
+                "user": "JoeSmoe",
+            },
+        )
+    last_id = client.get("/api/v1/blog-comments/Test Blog").get_json()[-1]["id"]
+    response = client.post(
+        "/api/v1/add-comment",
+        json={
+            "blog_title": "Test Blog",
+            "type": "sub",
+            "comment_content": "reply",
+            "user": "JoeSmoe",
+            "id": last_id,
+        },
+    )
+    assert response.get_json() == {"worked": True}
+
+    response = client.get("/api/v1/blog-comments/Test Blog")
+    comment_tree = response.get_json()
+    assert response.headers["X-Total-Count"] == "3"
+    assert [comment["text"] for comment in comment_tree] == [
+        "&zwnj;comment 0",
+        "&zwnj;comment 1",
+        "&zwnj;comment 2",
+    ]
+    assert comment_tree[0]["sub_comments"] == []
+    assert comment_tree[2]["sub_comments"][0]["text"] == "&zwnj;reply"
+    assert comment_tree[2]["sub_comments"][0]["user"] == "JoeSmoe"
+
+    page = client.get(
+        "/api/v1/blog-comments/Test Blog", query_string={"limit": 1, "offset": 1}
+    ).get_json()
+    assert [comment["text"] for comment in page] == ["&zwnj;comment 1"]
+
+    response = client.get("/api/v1/blog-comments/Missing Blog")
+    assert response.status_code == 404
+
+
+def test_add_comment_parallel_posts_are_not_lost(app) -> None:
+    def post_comment(index):
+        return (
+            app.test_client()
+            .post(
+                "/api/v1/add-comment",
+                json={
+                    "blog_title": "Test Blog",
+                    "type": "main",
+                    "comment_content": f"parallel {index}",
+                    "user": "JoeSmoe",
+                },
+            )
+            .get_json()["worked"]
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(executor.map(post_comment, range(40)))
+
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert len(blog["comments"]) == 40
+    assert app_extensions.mongo.db.comments.count_documents({}) == 40
+
+
+def test_add_comment_to_missing_thread(client) -> None:
+    response = client.post(
+        "/api/v1/add-comment",
+        json={
+            "blog_title": "Test Blog",
+            "type": "sub",
+            "comment_content": "reply",
+            "user": "JoeSmoe",
+            "id": "000000000000000000000000",
+        },
+    )
+    assert response.get_json() == {"worked": False}
+    assert app_extensions.mongo.db.comments.count_documents({}) == 0
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert "comment_count" not in blog and "updated_at" not in blog
+
+
+def test_sign_up_queues_confirmation_email(client) -> None:
+    response = client.post(
+        "/sign_up",
+        data={
+            "first_name": "Bob",
+            "last_name": "Builder",
+            "username": "BobBuilder",
+            "email": "bob@builder.com",
+            "password": "Password12",
+            "confirm_password": "Password12",
+        },
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    assert mail_queue.dispatcher.stub_transport.outbox == []
+    mail = app_extensions.mongo.db.outbound_mail.find_one()
+    assert mail["status"] == mail_queue.PENDING
+
+    assert mail_queue.dispatcher.run_once() == 1
+    assert len(mail_queue.dispatcher.stub_transport.outbox) == 1
+    mail = app_extensions.mongo.db.outbound_mail.find_one()
+    assert mail["status"] == mail_queue.SENT
+    assert "message" not in mail
+    assert mail["finished_at"] == mail["sent_at"]
+    assert mail_queue.dispatcher.run_once() == 0
+
+
+def test_sign_up_rejects_taken_email_and_confirm_handles_races(client) -> None:
+    form = {
+        "first_name": "Bob",
+        "last_name": "Builder",
+        "username": "BobBuilder",
+        "email": "joe@smoe.com",
+        "password": "Password12",
+        "confirm_password": "Password12",
+    }
+    response = client.post("/sign_up", data=form, follow_redirects=True)
+    assert b"An Account is Already Registered with that Email" in response.data
+    assert app_extensions.mongo.db.unverified_users.count_documents({}) == 0
+
+    response = client.post("/sign_up", data={**form, "email": "bob@builder.com"})
+    token = response.headers["Location"].rsplit("/", 1)[1]
+    # Someone else takes the username before the email is confirmed
+    app_extensions.mongo.db.users.insert_one(
+        {"username": "BobBuilder", "email": "other@builder.com"}
+    )
+    response = client.get(f"/confirm/{token}", follow_redirects=True)
+    assert b"An Account is Already Registered with that Username" in response.data
+
+    client.post(
+        "/sign_up", data={**form, "email": "bob@builder.com", "username": "Bob"}
+    )
+    app_extensions.mongo.db.users.update_one(
+        {"username": "BobBuilder"}, {"$set": {"email": "bob@builder.com"}}
+    )
+    response = client.post("/api/v1/auth/confirm-email", json={"token": token})
+    assert response.get_json() == {"success": False, "already": "email"}
+
+
+def test_mail_dispatcher_retries_with_backoff(app, monkeypatch) -> None:
+    def fail(messages):
+        raise ConnectionError("Gmail is down")
+
+    # Settings read from .env are strings
+    app.config.update(
+        {"MAIL_BATCH_SIZE": "10", "MAIL_LEASE": "300", "MAIL_RETRY_BACKOFF": "30"}
+    )
+
+    monkeypatch.setattr(mail_queue.dispatcher.stub_transport, "send_batch", fail)
+    _id = mail_queue.dispatcher.enqueue("bob@builder.com", "Subject", "Text")
+    assert mail_queue.dispatcher.run_once() == 1
+
+    mail = app_extensions.mongo.db.outbound_mail.find_one({"_id": _id})
+    assert mail["status"] == mail_queue.PENDING
+    assert mail["attempts"] == 1
+    assert mail["next_attempt_at"] > datetime.datetime.utcnow()
+    assert mail_queue.dispatcher.run_once() == 0
+
+    app.config["MAIL_MAX_ATTEMPTS"] = "1"
+    app_extensions.mongo.db.outbound_mail.update_one(
+        {"_id": _id}, {"$set": {"next_attempt_at": datetime.datetime.utcnow()}}
+    )
+    assert mail_queue.dispatcher.run_once() == 1
+    mail = app_extensions.mongo.db.outbound_mail.find_one({"_id": _id})
+    assert mail["status"] == mail_queue.FAILED
+    assert "message" not in mail and "finished_at" in mail
+
+
+def test_mail_dispatcher_starts_with_the_app(app, monkeypatch) -> None:
+    started = []
+    monkeypatch.setattr(mail_queue.dispatcher, "start", lambda: started.append(1))
+    for setting, starts in (("true", True), ("False", False), (False, False)):
+        started.clear()
+        app.config["MAIL_DISPATCHER_THREAD"] = setting
+        mail_queue.dispatcher.init_app(app)
+        assert bool(started) is starts
+
+
+def test_post_blog_uploads_image_in_background(client) -> None:
+    with open("blogger101/static/images/favicon.png", "rb") as image_file:
+        response = client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": "Image Blog",
+                "user": "JoeSmoe",
+                "blog_content": "image",
+                "file": (image_file, "image.png"),
+            },
+            content_type="multipart/form-data",
+        )
+    blog_id = response.get_json()["id"]
+    image_uploads.uploader.wait()
+
+    response_json = client.get(f"/api/v1/blog-image-status/{blog_id}").get_json()
+    assert response_json["status"] == image_uploads.DONE
+    assert response_json["image"].startswith("/uploads/")
+    assert response_json["image"].endswith(".webp")
+    assert client.get(response_json["image"]).status_code == 200
+
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Image Blog"})
+    card = Image.open(io.BytesIO(client.get(blog["image_card"]).data))
+    assert card.format == "WEBP"
+    assert max(card.size) <= image_uploads.VARIANT_SIZES["card"]
+
+
+def test_post_blog_rejects_oversized_upload(app, client) -> None:
+    app.config["MAX_CONTENT_LENGTH"] = 1024
+    response = client.post(
+        "/api/v1/post-blog",
+        data={
+            "title": "Huge Blog",
+            "user": "JoeSmoe",
+            "blog_content": "huge",
+            "file": (io.BytesIO(b"0" * 4096), "image.png"),
+        },
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 413
+    assert response.get_json()["success"] is False
+    assert app_extensions.mongo.db.blogs.find_one({"title": "Huge Blog"}) is None
+
+
+def test_post_blog_without_image_saves_nothing(client) -> None:
+    response = client.post(
+        "/api/v1/post-blog",
+        data={
+            "title": "Imageless Blog",
+            "user": "JoeSmoe",
+            "blog_content": "no image",
+            "tags": "orphan",
+        },
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+    assert app_extensions.mongo.db.blogs.find_one({"title": "Imageless Blog"}) is None
+    assert app_extensions.mongo.db.tag_counts.count_documents({}) == 0
+
+
+def test_failed_image_upload_is_reported(app, client, monkeypatch) -> None:
+    def fail(path, filename):
+        raise ConnectionError("Imgur is down")
+
+    # As read from .env, where every setting is a string
+    app.config.update({"IMAGE_UPLOAD_ATTEMPTS": "2", "IMAGE_UPLOAD_BACKOFF": "0"})
+    monkeypatch.setattr(image_uploads.uploader.get_store(), "save", fail)
+    with open("blogger101/static/images/favicon.png", "rb") as image_file:
+        response = client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": "Broken Image Blog",
+                "user": "JoeSmoe",
+                "blog_content": "image",
+                "file": (image_file, "image.png"),
+            },
+            content_type="multipart/form-data",
+        )
+    blog_id = response.get_json()["id"]
+    image_uploads.uploader.wait()
+
+    response_json = client.get(f"/api/v1/blog-image-status/{blog_id}").get_json()
+    assert response_json["status"] == image_uploads.FAILED
+    assert response_json["image"] == ""
+
+
+def test_make_variants_downscales(tmp_path) -> None:
+    path = tmp_path / "large.jpg"
+    Image.new("RGB", (3200, 1600), "red").save(path)
+    variants = image_uploads.make_variants(str(path), "JPEG")
+    with Image.open(variants["card"]) as card, Image.open(variants["full"]) as full:
+        assert card.size == (384, 192)
+        assert full.size == (1600, 800)
+        assert card.format == full.format == "JPEG"
+
+
+def test_make_variants_removes_written_files_on_failure(tmp_path, monkeypatch) -> None:
+    path = tmp_path / "large.jpg"
+    Image.new("RGB", (3200, 1600), "red").save(path)
+    variant_folder = tmp_path / "variants"
+    variant_folder.mkdir()
+    monkeypatch.setattr(image_uploads.tempfile, "tempdir", str(variant_folder))
+    save = Image.Image.save
+
+    def fail_second_variant(image, file, *args, **kwargs):
+        if len(os.listdir(variant_folder)) > 1:
+            raise OSError("disk full")
+        return save(image, file, *args, **kwargs)
+
+    monkeypatch.setattr(Image.Image, "save", fail_second_variant)
+    try:
+        image_uploads.make_variants(str(path), "JPEG")
+    except OSError:
+        pass
+    else:
+        raise AssertionError("make_variants should have failed")
+    assert os.listdir(variant_folder) == []
+
+
+def test_image_upload_retry_keeps_uploaded_variants(app, client, monkeypatch) -> None:
+    store = image_uploads.uploader.get_store()
+    save = store.save
+    saved = []
+
+    def fail_full_once(path, filename):
+        saved.append(filename)
+        if len(saved) == 2:
+            raise ConnectionError("Imgur is down")
+        return save(path, filename)
+
+    app.config.update({"IMAGE_UPLOAD_ATTEMPTS": 2, "IMAGE_UPLOAD_BACKOFF": 0})
+    monkeypatch.setattr(store, "save", fail_full_once)
+    with open("blogger101/static/images/favicon.png", "rb") as image_file:
+        response = client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": "Retried Image Blog",
+                "user": "JoeSmoe",
+                "blog_content": "image",
+                "file": (image_file, "image.png"),
+            },
+            content_type="multipart/form-data",
+        )
+    image_uploads.uploader.wait()
+
+    card, full, retried = saved
+    assert retried == full != card
+    response_json = client.get(
+        f"/api/v1/blog-image-status/{response.get_json()['id']}"
+    ).get_json()
+    assert response_json["status"] == image_uploads.DONE
+
+
+def test_login_rehashes_password_at_configured_cost(app, client) -> None:
+    app.config["BCRYPT_LOG_ROUNDS"] = 4
+    client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "Password123"},
+        content_type="multipart/form-data",
+    )
+    passwords.hasher.wait()
+
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    assert passwords.hash_rounds(user["password"]) == 4
+    assert passwords.hasher.check(user["password"], "Password123")
+    assert passwords.hasher.needs_rehash(user["password"]) is False
+
+
+def test_password_hashing_in_process_pool(app) -> None:
+    app.config.update({"BCRYPT_LOG_ROUNDS": 4, "BCRYPT_PROCESS_POOL_SIZE": 1})
+    password_hash = passwords.hasher.hash("Password123")
+    assert passwords.hash_rounds(password_hash) == 4
+    assert passwords.hasher.check(password_hash, "Password123")
+    assert not passwords.hasher.check(password_hash, "WrongPassword")
+
+
+def test_calibrate_rounds_stays_in_bounds() -> None:
+    assert passwords.calibrate_rounds(0) == passwords.MIN_ROUNDS
+    assert passwords.calibrate_rounds(10**6, max_rounds=11) == 11
+
+
+def test_login_verifies_password_once(client, monkeypatch) -> None:
+    checks = []
+    check = passwords.hasher.check
+
+    def counting_check(password_hash, password):
+        checks.append(password_hash)
+        return check(password_hash, password)
+
+    monkeypatch.setattr(passwords.hasher, "check", counting_check)
+    client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "Password123"},
+        content_type="multipart/form-data",
+    )
+    assert len(checks) == 1
+
+
+def test_low_recaptcha_login_needs_email_confirmation(client, monkeypatch) -> None:
+    monkeypatch.setattr(recaptcha.scorer.fake_verifier, "next_score", 0.1)
+    response = client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "Password123"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        assert not auth.logged_in(session)
+    mail = app_extensions.mongo.db.outbound_mail.find_one()
+    assert mail["message"]["raw"]
+
+
+def test_failed_credentials_skip_recaptcha(client) -> None:
+    client.post(
+        "/login",
+        data={"email": "nobody@smoe.com", "password": "Password123", "token": "a"},
+        content_type="multipart/form-data",
+    )
+    client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "WrongPassword", "token": "b"},
+        content_type="multipart/form-data",
+    )
+    assert recaptcha.scorer.fake_verifier.tokens == []
+
+
+def test_recaptcha_failure_requires_email_confirmation(client, monkeypatch) -> None:
+    def fail(token):
+        raise ConnectionError("reCAPTCHA is down")
+
+    monkeypatch.setattr(recaptcha.scorer.fake_verifier, "score", fail)
+    response = client.post(
+        "/login",
+        data={"email": "joe@smoe.com", "password": "Password123", "token": "a"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        assert not auth.logged_in(session)
+
+
+def test_duplicate_blog_title_is_rejected(client) -> None:
+    responses = []
+    for user in ("JoeSmoe", "SomeoneElse"):
+        with open("blogger101/static/images/favicon.png", "rb") as image_file:
+            responses.append(
+                client.post(
+                    "/api/v1/post-blog",
+                    data={
+                        "title": "Twice Posted",
+                        "user": user,
+                        "blog_content": "copy",
+                        "file": (image_file, "image.png"),
+                    },
+                    content_type="multipart/form-data",
+                ).get_json()
+            )
+    image_uploads.uploader.wait()
+    assert responses[0]["success"] is True
+    assert responses[1]["success"] is False
+    assert (
+        app_extensions.mongo.db.blogs.count_documents({"name": "twice_posted.html"})
+        == 1
+    )
+
+
+def test_ensure_indexes_is_idempotent(app, runner) -> None:
+    db.ensure_indexes()
+    result = runner.invoke(args=["db", "ensure-indexes"])
+    assert "Indexes are up to date" in result.output
+    assert "users.users_email" in result.output
+
+    blog_indexes = app_extensions.mongo.db.blogs.index_information()
+    assert blog_indexes["blogs_name"]["unique"] is True
+    user_indexes = app_extensions.mongo.db.users.index_information()
+    assert user_indexes["users_email"]["unique"] is True
+    assert user_indexes["users_username"]["unique"] is True
+
+
+def test_password_reset_token_is_single_use(app, client) -> None:
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    token = password_resets.create(user["_id"])
+    assert client.get(f"/change_password/{token}").status_code == 200
+    stored = app_extensions.mongo.db.password_resets.find_one()
+    assert stored["_id"] != token
+
+    for new_password in ("NewPassword1", "NewPassword2"):
+        client.post(
+            f"/change_password/{token}",
+            data={"password": new_password, "confirm_password": new_password},
+            content_type="multipart/form-data",
+        )
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    assert passwords.hasher.check(user["password"], "NewPassword1")
+    assert client.get(f"/change_password/{token}").status_code == 302
+
+
+def test_change_password_api(client) -> None:
+    response = client.post(
+        "/api/v1/auth/change-password-email", json={"email": "joe@smoe.com"}
+    )
+    assert response.get_json()["success"] is True
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    token = password_resets.create(user["_id"])
+
+    response = client.post(
+        "/api/v1/auth/change-password",
+        json={"token": token, "new_password": "NewPassword1"},
+    )
+    assert response.get_json()["success"] is True
+    response = client.post(
+        "/api/v1/auth/change-password",
+        json={"token": token, "new_password": "NewPassword2"},
+    )
+    assert response.status_code == 401
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    assert passwords.hasher.check(user["password"], "NewPassword1")
+    assert app_extensions.mongo.db.password_resets.count_documents({}) == 0
+
+
+def test_change_password_rejects_missing_input_without_using_token(client) -> None:
+    user = app_extensions.mongo.db.users.find_one({"email": "joe@smoe.com"})
+    token = password_resets.create(user["_id"])
+
+    response = client.post("/api/v1/auth/change-password", json={"token": token})
+    assert response.status_code == 400
+    response = client.post(
+        "/api/v1/auth/change-password", json={"new_password": "NewPassword1"}
+    )
+    assert response.status_code == 400
+    response = client.post(
+        f"/change_password/{token}",
+        data={"password": "", "confirm_password": ""},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    assert password_resets.is_valid(token)
+
+    response = client.post(
+        "/api/v1/auth/change-password",
+        json={"token": token, "new_password": "NewPassword1"},
+    )
+    assert response.get_json()["success"] is True
+
+
+def test_blog_page_serves_rendered_markdown(client) -> None:
+    response = client.get("/blog/Test_Blog/")
+    assert response.status_code == 200
+    assert b"<code>hi</code> and <strong>bye</strong>" in response.data
+    assert b"marked.min.js" not in response.data
+
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert blog["html"] == "<p><code>hi</code> and <strong>bye</strong></p>"
+    assert blog["content_hash"] == markdown_render.content_hash(blog["text"])
+    # Rendering is a write the change feed and listing validators must see
+    assert blog["updated_at"] >= blog["released_at"]
+
+    stale = datetime.datetime(2022, 1, 1)
+    app_extensions.mongo.db.blogs.update_one(
+        {"_id": blog["_id"]},
+        {"$unset": {"html": ""}, "$set": {"updated_at": stale}},
+    )
+    assert db.render_markdown() == 1
+    blog = app_extensions.mongo.db.blogs.find_one({"_id": blog["_id"]})
+    assert blog["updated_at"] > stale
+
+
+def test_markdown_is_sanitized_on_write(client) -> None:
+    client.post(
+        "/api/v1/update-blog",
+        json={
+            "title": "Test Blog",
+            "old_title": "Test Blog",
+            "user": "JoeSmoe",
+            "blog_content": "# Title\n<script>alert(1)</script>[x](javascript:alert(1))",
+        },
+    )
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert "<h1>Title</h1>" in blog["html"]
+    assert "<script>" not in blog["html"]
+    assert "javascript:" not in blog["html"]
+
+    client.post(
+        "/api/v1/add-comment",
+        json={
+            "blog_title": "Test Blog",
+            "type": "main",
+            "comment_content": "**bold** <img src=x onerror=alert(1)>",
+            "user": "JoeSmoe",
+        },
+    )
+    comment = client.get("/api/v1/blog-comments/Test Blog").get_json()[0]
+    assert "<strong>bold</strong>" in comment["html"]
+    assert "onerror" not in comment["html"]
+    assert comment["text"] == "&zwnj;**bold** <img src=x onerror=alert(1)>"
+
+
+def test_blog_page_conditional_get(client) -> None:
+    response = client.get("/blog/Test_Blog/")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "public, no-cache"
+    assert "Surrogate-Control" in response.headers
+    last_modified = response.headers["Last-Modified"]
+
+    response = client.get("/blog/Test_Blog/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    response = client.get(
+        "/blog/Test_Blog/", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    client.post(
+        "/api/v1/update-blog",
+        json={
+            "title": "Test Blog",
+            "old_title": "Test Blog",
+            "user": "JoeSmoe",
+            "blog_content": "Changed",
+        },
+    )
+    # Updating a blog lowercases its page name
+    response = client.get("/blog/test_blog/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_blog_page_logged_in_is_private(client) -> None:
+    anonymous_etag = client.get("/blog/Test_Blog/").headers["ETag"]
+    with client.session_transaction() as session:
+        session["logged_in"] = {
+            "email": "joe@smoe.com",
+            "first_name": "Joe",
+            "last_name": "Smoe",
+            "username": "JoeSmoe",
+        }
+
+    response = client.get("/blog/Test_Blog/", headers={"If-None-Match": anonymous_etag})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.headers["Surrogate-Control"] == "no-store"
+    assert response.headers["ETag"] != anonymous_etag
+
+
+def test_blog_apis_conditional_get(client) -> None:
+    blogs_etag = client.get("/api/v1/blogs").headers["ETag"]
+    page_etag = client.get("/api/v1/blogs?limit=1").headers["ETag"]
+    comments_etag = client.get("/api/v1/blog-comments/Test Blog").headers["ETag"]
+    assert page_etag != blogs_etag
+
+    assert (
+        client.get("/api/v1/blogs", headers={"If-None-Match": blogs_etag}).status_code
+        == 304
+    )
+    response = client.get(
+        "/api/v1/blog-comments/Test Blog", headers={"If-None-Match": comments_etag}
+    )
+    assert response.status_code == 304
+    assert response.headers["X-Total-Count"] == "0"
+
+    client.post(
+        "/api/v1/add-comment",
+        json={
+            "blog_title": "Test Blog",
+            "type": "main",
+            "comment_content": "New",
+            "user": "JoeSmoe",
+        },
+    )
+    assert (
+        client.get("/api/v1/blogs", headers={"If-None-Match": blogs_etag}).status_code
+        == 200
+    )
+    assert (
+        client.get(
+            "/api/v1/blogs?limit=1", headers={"If-None-Match": page_etag}
+        ).status_code
+        == 200
+    )
+    response = client.get(
+        "/api/v1/blog-comments/Test Blog", headers={"If-None-Match": comments_etag}
+    )
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+
+
+def test_blogs_api_is_modified_by_deletions(client) -> None:
+    hour_ago = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+    app_extensions.mongo.db.blogs.update_one(
+        {"title": "Test Blog"}, {"$set": {"updated_at": hour_ago}}
+    )
+    app_extensions.mongo.db.blogs.insert_one(
+        {
+            "title": "Doomed",
+            "user": "JoeSmoe",
+            "released_at": datetime.datetime.utcnow(),
+            "updated_at": hour_ago + datetime.timedelta(minutes=1),
+        }
+    )
+    last_modified = client.get("/api/v1/blogs").headers["Last-Modified"]
+    client.get("/api/v1/delete-blog?title=Doomed&user=JoeSmoe")
+
+    response = client.get("/api/v1/blogs", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert [blog["title"] for blog in response.get_json()] == ["Test Blog"]
+
+
+def test_anonymous_pages_are_cached_until_a_blog_write(client) -> None:
+    assert client.get("/blog/Test_Blog/").status_code == 200
+    assert client.get("/blog/Test_Blog/").status_code == 200
+    client.get("/user/JoeSmoe/")
+    client.get("/user/JoeSmoe/")
+    assert cache.pages.stats()["hits"] == 2
+
+    client.post(
+        "/api/v1/update-blog",
+        json={
+            "title": "Test Blog",
+            "old_title": "Test Blog",
+            "user": "JoeSmoe",
+            "blog_content": "Changed",
+        },
+    )
+    response = client.get("/blog/test_blog/")
+    assert b"<p>Changed</p>" in response.data
+    assert cache.pages.stats()["misses"] == 3
+
+    # A page greeting a logged in user is never served from the cache
+    with client.session_transaction() as session:
+        session["logged_in"] = {
+            "email": "joe@smoe.com",
+            "first_name": "Joe",
+            "last_name": "Smoe",
+            "username": "JoeSmoe",
+        }
+    assert b"JoeSmoe" in client.get("/blog/test_blog/").data
+    assert cache.pages.stats()["hits"] == 2
+
+
+def test_page_cache_evicts_least_recently_used(app) -> None:
+    app.config["PAGE_CACHE_SIZE"] = 2
+    cache.pages.get_or_set("a", lambda: "A")
+    cache.pages.get_or_set("b", lambda: "B")
+    cache.pages.get_or_set("a", lambda: "stale")
+    cache.pages.get_or_set("c", lambda: "C")
+
+    assert cache.pages.stats() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "entries": 2,
+    }
+    assert cache.pages.get_or_set("a", lambda: "new") == "A"
+    assert cache.pages.get_or_set("b", lambda: "new") == "new"
+
+    app.config["PAGE_CACHE_TTL"] = 0
+    cache.pages.get_or_set("d", lambda: "D")
+    assert cache.pages.get_or_set("d", lambda: "new D") == "new D"
+
+
+def test_static_assets_are_fingerprinted_and_precompressed(app, client) -> None:
+    page = client.get("/login").data.decode()
+    with app.test_request_context():
+        css_url = static_assets.assets.url("materialize/materialize.min.css")
+    assert css_url.startswith("/assets/materialize/materialize.min.")
+    assert f'href="{css_url}"' in page
+
+    with open(
+        os.path.join(app.static_folder, "materialize/materialize.min.css"), "rb"
+    ) as file:
+        original = file.read()
+
+    response = client.get(css_url, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["Cache-Control"] == static_assets.IMMUTABLE_CACHE_CONTROL
+    assert response.mimetype == "text/css"
+    assert brotli.decompress(response.data) == original
+
+    response = client.get(css_url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == original
+
+    response = client.get(css_url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == original
+
+
+def test_static_assets_skip_build_when_disabled(app, tmp_path) -> None:
+    disabled = Flask("blogger101")
+    disabled.config.update(
+        {"ASSETS_FOLDER": str(tmp_path), "ASSETS_BUILD_ON_STARTUP": "False"}
+    )
+    assets = static_assets.StaticAssets()
+    assets.init_app(disabled)
+    assert assets.manifest == {}
+    assert os.listdir(tmp_path) == []
+
+
+def test_responses_are_compressed_by_route_policy(app, client) -> None:
+    for number in range(20):
+        client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": f"Compressed {number}",
+                "user": "JoeSmoe",
+                "blog_content": "Lots of text. " * 50,
+                "file": (io.BytesIO(b""), "empty.png"),
+            },
+        )
+    image_uploads.uploader.wait()
+
+    response = client.get("/api/v1/blogs", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(json.loads(brotli.decompress(response.data))) == 21
+
+    response = client.get("/api/v1/blogs", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(json.loads(gzip.decompress(response.data))) == 21
+
+    # Smaller than the minimum size
+    response = client.get(
+        "/api/v1/blog-comments/Test Blog", headers={"Accept-Encoding": "br"}
+    )
+    assert "Content-Encoding" not in response.headers
+
+    app.config["COMPRESSION_POLICIES"] = {"routes.api_blogs": {"algorithms": ()}}
+    assert compression.compressor.policy("routes.api_blogs").algorithms == ()
+    response = client.get("/api/v1/blogs", headers={"Accept-Encoding": "br"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_blogs_api_streams_the_full_dump(app, client, monkeypatch) -> None:
+    monkeypatch.setattr(listing, "EXPORT_CHUNK_SIZE", 1)
+    for number in range(3):
+        client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": f"Streamed {number}",
+                "user": "JoeSmoe",
+                "blog_content": "Text",
+                "file": (io.BytesIO(b""), "empty.png"),
+            },
+        )
+    image_uploads.uploader.wait()
+
+    response = client.get("/api/v1/blogs", buffered=False)
+    assert response.is_streamed
+    chunks = list(response.response)
+    assert len(chunks) == 5
+    blogs = json.loads(b"".join(chunks))
+    assert [blog["title"] for blog in blogs] == [
+        "Streamed 2",
+        "Streamed 1",
+        "Streamed 0",
+        "Test Blog",
+    ]
+    assert "html" not in blogs[0]
+
+    response = client.get("/api/v1/blogs?stream=ndjson&relative=1")
+    assert response.mimetype == "application/x-ndjson"
+    lines = response.data.decode().splitlines()
+    assert [json.loads(line)["link"] for line in lines] == [
+        "/blog/streamed_2",
+        "/blog/streamed_1",
+        "/blog/streamed_0",
+        "/blog/test_blog",
+    ]
+
+    response = client.get(
+        "/api/v1/blogs?stream=ndjson&relative=1", headers={"Accept-Encoding": "br"}
+    )
+    assert response.headers["Content-Encoding"] == "br"
+    assert brotli.decompress(response.data).decode().splitlines() == lines
+
+
+def test_changes_feed(app, client) -> None:
+    # Settings read from .env are strings
+    app.config["CHANGES_SETTLE_SECONDS"] = "0"
+    assert db.backfill_updated_at() == 1
+    test_blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+
+    response = client.get("/api/v1/changes").get_json()
+    assert [blog["title"] for blog in response["blogs"]] == ["Test Blog"]
+    assert response["deleted"] == []
+    assert response["more"] is False
+    since = response["next"]
+
+    response = client.get(f"/api/v1/changes?since={since}").get_json()
+    assert response["blogs"] == [] and response["deleted"] == []
+    since = response["next"]
+
+    for number in range(2):
+        client.post(
+            "/api/v1/post-blog",
+            data={
+                "title": f"Synced {number}",
+                "user": "JoeSmoe",
+                "blog_content": "Text",
+                "file": (io.BytesIO(b""), "empty.png"),
+            },
+        )
+        # The failed upload stamps updated_at again, which orders the blogs
+        image_uploads.uploader.wait()
+    client.get("/api/v1/delete-blog?title=Test Blog&user=JoeSmoe")
+
+    response = client.get(f"/api/v1/changes?since={since}&limit=1").get_json()
+    assert [blog["title"] for blog in response["blogs"]] == ["Synced 0"]
+    assert response["more"] is True
+
+    response = client.get(f"/api/v1/changes?since={response['next']}").get_json()
+    assert [blog["title"] for blog in response["blogs"]] == ["Synced 1"]
+    assert response["deleted"] == [str(test_blog["_id"])]
+    assert "text" in response["blogs"][0] and "html" not in response["blogs"][0]
+
+
+def test_changes_feed_rejects_expired_tokens(client) -> None:
+    expired = listing.encode_position(
+        datetime.datetime.utcnow() - changes.TOMBSTONE_LIFETIME * 2,
+        app_extensions.mongo.db.blogs.find_one()["_id"],
+    )
+    response = client.get(f"/api/v1/changes?since={expired}")
+    assert response.status_code == 410
+    assert response.get_json()["resync"] is True
+
+    assert client.get("/api/v1/changes?since=garbage").status_code == 400
+
+
+def test_blog_list_fields_and_summaries(app, client) -> None:
+    assert db.backfill_summaries() == 1
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert blog["updated_at"] >= blog["released_at"]
+    for comment_type, thread in (("main", None), ("sub", "first")):
+        if thread:
+            thread = client.get("/api/v1/blog-comments/Test Blog").get_json()[0]["id"]
+        client.post(
+            "/api/v1/add-comment",
+            json={
+                "blog_title": "Test Blog",
+                "type": comment_type,
+                "id": thread,
+                "comment_content": "Hi",
+                "user": "JoeSmoe",
+            },
+        )
+
+    response = client.get(
+        "/api/v1/blogs?limit=5&fields=title,excerpt,word_count,comment_count"
+    )
+    blog = response.get_json()["blogs"][0]
+    assert set(blog) == {
+        "_id",
+        "title",
+        "excerpt",
+        "word_count",
+        "comment_count",
+        "released_at",
+    }
+    assert blog["excerpt"] == "hi and bye"
+    assert blog["word_count"] == 3
+    assert blog["comment_count"] == 2
+
+    blog = client.get("/api/v1/blogs?limit=5").get_json()["blogs"][0]
+    assert "text" not in blog and "comments" not in blog
+    assert blog["excerpt"] == "hi and bye"
+
+    blogs = client.get("/api/v1/blogs?fields=title").get_json()
+    assert blogs == [{"_id": blog["_id"], "title": "Test Blog"}]
+
+    blog = client.get("/api/v1/user-blogs/JoeSmoe").get_json()["blogs"][0]
+    assert "text" not in blog and "html" not in blog
+    assert blog["excerpt"] == "hi and bye"
+
+    assert client.get("/api/v1/blogs?fields=title,password").status_code == 400
+    assert client.get("/api/v1/user-blogs/JoeSmoe?fields=").status_code == 400
+
+
+def test_excerpt_is_cut_at_a_word() -> None:
+    fields = markdown_render.rendered_fields("# Title\n\n" + "word " * 100)
+    assert fields["word_count"] == 101
+    assert fields["excerpt"].startswith("Title word word")
+    assert fields["excerpt"].endswith(" word…")
+    assert len(fields["excerpt"]) <= markdown_render.EXCERPT_LENGTH + 1
+
+
+def _insert_searchable_blogs() -> None:
+    now = datetime.datetime.utcnow()
+    app_extensions.mongo.db.blogs.insert_many(
+        {
+            "title": title,
+            "user": "JoeSmoe",
+            "name": f"{title.lower().replace(' ', '_')}.html",
+            "text": text,
+            **markdown_render.rendered_fields(text),
+            "link": f"/blog/{title.lower().replace(' ', '_')}",
+            "released_at": now - datetime.timedelta(days=days_old),
+            "comments": [],
+            "image": "",
+        }
+        for title, text, days_old in (
+            ("Gardening Tips", "Water the *tomatoes* early.", 400),
+            ("Cooking", "Roast the tomatoes with garlic and <b>oil</b>.", 1),
+            ("Travel", "Tomatoes are cheap in Spain.", 2),
+        )
+    )
+
+
+def test_search_api_ranks_and_pages(app, client) -> None:
+    # Settings read from .env are strings
+    app.config["SEARCH_MAX_TIME_MS"] = "1000"
+    _insert_searchable_blogs()
+
+    response = client.get("/api/v1/search?q=tomatoes&limit=2")
+    assert response.status_code == 200
+    first = response.get_json()
+    assert len(first["results"]) == 2
+    assert first["next"]
+    assert "<mark>tomatoes</mark>" in first["results"][0]["snippet"].lower()
+    assert "html" not in first["results"][0]
+
+    second = client.get(f"/api/v1/search?q=tomatoes&limit=2&after={first['next']}")
+    titles = [blog["title"] for blog in first["results"]] + [
+        blog["title"] for blog in second.get_json()["results"]
+    ]
+    assert sorted(titles) == ["Cooking", "Gardening Tips", "Travel"]
+    assert second.get_json()["next"] is None
+
+    assert client.get("/api/v1/search?q=gardening").get_json()["results"][0][
+        "title"
+    ] == "Gardening Tips"
+    recent = client.get("/api/v1/search?q=tomatoes&recent=1").get_json()
+    assert recent["results"][-1]["title"] == "Gardening Tips"
+
+    assert client.get("/api/v1/search?q=").status_code == 400
+    assert client.get("/api/v1/search?q=tomatoes&after=garbage").status_code == 400
+
+
+def test_search_page_highlights_matches(client) -> None:
+    _insert_searchable_blogs()
+    response = client.get("/search?q=garlic")
+    assert response.status_code == 200
+    assert b"<mark>garlic</mark>" in response.data
+    assert b"<b>oil" not in response.data
+    assert client.get("/search").status_code == 200
+
+
+def test_snippet_is_cut_around_the_first_match() -> None:
+    plain = "intro " * 60 + "the <script> needle here " + "outro " * 60
+    snippet = search.snippet(plain, search.terms("needle -intro"))
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "<mark>needle</mark>" in snippet
+    assert "&lt;script&gt;" in snippet
+    assert search.terms("Tomato -garlic soup!") == ["tomato", "soup"]
+
+
+def test_tags_are_counted_on_writes(client) -> None:
+    for title, blog_tags in (("Tagged One", "Travel, food"), ("Tagged Two", "food")):
+        with open("blogger101/static/images/favicon.png", "rb") as image_file:
+            client.post(
+                "/api/v1/post-blog",
+                data={
+                    "title": title,
+                    "user": "JoeSmoe",
+                    "blog_content": "tagged",
+                    "tags": blog_tags,
+                    "file": (image_file, "image.png"),
+                },
+                content_type="multipart/form-data",
+            )
+    image_uploads.uploader.wait()
+
+    assert client.get("/api/v1/tags").get_json()["tags"] == [
+        {"tag": "food", "count": 2},
+        {"tag": "travel", "count": 1},
+    ]
+    page = client.get("/api/v1/tags/Food?limit=1").get_json()
+    assert [blog["title"] for blog in page["blogs"]] == ["Tagged Two"]
+    assert "text" not in page["blogs"][0]
+    page = client.get(f"/api/v1/tags/food?limit=1&after={page['next']}").get_json()
+    assert [blog["title"] for blog in page["blogs"]] == ["Tagged One"]
+
+    client.post(
+        "/api/v1/update-blog",
+        json={
+            "title": "Tagged One",
+            "old_title": "Tagged One",
+            "user": "JoeSmoe",
+            "blog_content": "retagged",
+            "tags": ["cooking"],
+        },
+    )
+    client.get("/api/v1/delete-blog?title=Tagged Two&user=JoeSmoe")
+    counts = client.get("/api/v1/tags").get_json()["tags"]
+    assert counts == [{"tag": "cooking", "count": 1}]
+
+    app_extensions.mongo.db.tag_counts.delete_many({})
+    assert tags.rebuild_counts() == 1
+    assert client.get("/api/v1/tags").get_json()["tags"] == counts
+
+
+def test_invalid_tags_are_rejected() -> None:
+    assert tags.parse(" Rust,rust, web-dev ,") == ["rust", "web-dev"]
+    for value in ("no spaces", "a" * (tags.MAX_TAG_LENGTH + 1), ["ok", 1]):
+        try:
+            tags.parse(value)
+        except tags.InvalidTags:
+            continue
+        raise AssertionError(f"{value!r} was accepted")
+    assert len(tags.parse([str(number) for number in range(tags.MAX_TAGS)])) == 10
+
+
+def test_blog_views_are_written_in_batches(app, client) -> None:
+    app.config["VIEW_FLUSH_THRESHOLD"] = 3
+    blog_id = app_extensions.mongo.db.blogs.find_one()["_id"]
+
+    for _ in range(2):
+        assert client.get("/blog/Test_Blog/").status_code == 200
+    assert view_counts.counter.pending() == 2
+    assert "views" not in app_extensions.mongo.db.blogs.find_one({"_id": blog_id})
+
+    client.get("/blog/Test_Blog/")
+    assert view_counts.counter.pending() == 0
+    assert app_extensions.mongo.db.blogs.find_one({"_id": blog_id})["views"] == 3
+
+    client.get("/blog/Test_Blog/")
+    view_counts.counter.drain()
+    assert app_extensions.mongo.db.blogs.find_one({"_id": blog_id})["views"] == 4
+    hour = app_extensions.mongo.db.blog_view_hours.find_one({"blog": blog_id})
+    assert hour["views"] == 4
+    client.get("/blog/missing/")
+    assert view_counts.counter.pending() == 0
+
+    # Views would go stale behind the listing validators
+    blog = client.get("/api/v1/blogs?limit=5").get_json()["blogs"][0]
+    assert "views" not in blog
+    assert client.get("/api/v1/blogs?fields=views").status_code == 400
+
+
+def test_blog_views_only_retry_what_was_not_written(app, client, monkeypatch) -> None:
+    collection_type = type(app_extensions.mongo.db.blog_view_hours)
+    bulk_write = collection_type.bulk_write
+
+    def fail_on_hours(collection, *args, **kwargs):
+        if collection.name == "blog_view_hours":
+            raise pymongo.errors.AutoReconnect("connection lost")
+        return bulk_write(collection, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "bulk_write", fail_on_hours)
+    client.get("/blog/Test_Blog/")
+    client.get("/blog/Test_Blog/")
+    assert view_counts.counter.flush() == 2
+    monkeypatch.setattr(collection_type, "bulk_write", bulk_write)
+    assert view_counts.counter.flush() == 0
+
+    blog = app_extensions.mongo.db.blogs.find_one({"title": "Test Blog"})
+    assert blog["views"] == 2
+    hour = app_extensions.mongo.db.blog_view_hours.find_one({"blog": blog["_id"]})
+    assert hour["views"] == 2
+
+
+def test_trending_blogs_decay_with_age(app, client) -> None:
+    now = datetime.datetime.utcnow()
+    old_blog = app_extensions.mongo.db.blogs.find_one()["_id"]
+    new_blog = app_extensions.mongo.db.blogs.insert_one(
+        {"title": "Fresh", "user": "JoeSmoe", "link": "/blog/fresh", "image": ""}
+    ).inserted_id
+    app_extensions.mongo.db.blog_view_hours.insert_many(
+        [
+            {"blog": old_blog, "hour": now - datetime.timedelta(hours=72), "views": 40},
+            {"blog": new_blog, "hour": now - datetime.timedelta(hours=1), "views": 10},
+            {"blog": "deleted", "hour": now, "views": 100},
+        ]
+    )
+
+    assert view_counts.counter.update_trending()
+    # Another worker does not recompute before the interval is up
+    assert not view_counts.counter.update_trending()
+
+    blogs = client.get("/api/v1/trending").get_json()["blogs"]
+    assert [blog["title"] for blog in blogs] == ["Fresh", "Test Blog"]
+    assert blogs[0]["score"] > blogs[1]["score"]
+    blogs = client.get("/api/v1/trending?limit=1").get_json()["blogs"]
+    assert [blog["title"] for blog in blogs] == ["Fresh"]